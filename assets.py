@@ -0,0 +1,45 @@
+import functools, os
+import pygame
+
+# Images and fonts, loaded the first time they are needed and shared from then on
+# Nothing is loaded (and no display is needed) just by importing a module that uses them, so headless workers
+# and scripts that only need the simulation start quickly.
+
+ASSET_DIR = "assets"
+
+
+@functools.lru_cache(maxsize=None)
+def image(name, scale=1, size=None):
+    # An image from the assets folder, doubled in size if scale is 2, or stretched to size=(width, height)
+    # Loaded without convert_alpha(), since that needs an open display
+    img = pygame.image.load(os.path.join(ASSET_DIR, name))
+    if scale == 2:
+        img = pygame.transform.scale2x(img)
+    if size is not None:
+        img = pygame.transform.scale(img, size)
+    return img
+
+
+@functools.lru_cache(maxsize=None)
+def font(size, name="font.otf"):
+    if not pygame.font.get_init():
+        pygame.font.init()
+    return pygame.font.Font(os.path.join(ASSET_DIR, name), size)
+
+
+class lazy(object):
+    # A class attribute that is only computed when it is first read, for example 'IMG = lazy(lambda: image("base.png"))'
+    # The computed value then replaces the lazy attribute on the class, so later reads cost nothing extra,
+    # and it can be reassigned like any other class attribute
+
+    def __init__(self, function):
+        self.function = function
+        self.name = None
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner):
+        value = self.function()
+        setattr(owner, self.name, value)
+        return value
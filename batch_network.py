@@ -0,0 +1,207 @@
+from array import array
+import numpy as np
+from neat.graphs import feed_forward_layers
+
+# NumPy versions of the neat-python activation functions (see neat/activations.py)
+# They work on whole arrays at once, but otherwise compute exactly the same thing
+ACTIVATIONS = {
+    'sigmoid': lambda z: 1.0 / (1.0 + np.exp(-np.clip(5.0 * z, -60.0, 60.0))),
+    'tanh': lambda z: np.tanh(np.clip(2.5 * z, -60.0, 60.0)),
+    'sin': lambda z: np.sin(np.clip(5.0 * z, -60.0, 60.0)),
+    'gauss': lambda z: np.exp(-5.0 * np.clip(z, -3.4, 3.4)**2),
+    'relu': lambda z: np.where(z > 0.0, z, 0.0),
+    'softplus': lambda z: 0.2 * np.log(1 + np.exp(np.clip(5.0 * z, -60.0, 60.0))),
+    'identity': lambda z: z,
+    'clamped': lambda z: np.clip(z, -1.0, 1.0),
+    'exp': lambda z: np.exp(np.clip(z, -60.0, 60.0)),
+    'abs': lambda z: np.abs(z),
+    'hat': lambda z: np.maximum(0.0, 1 - np.abs(z)),
+    'square': lambda z: z ** 2,
+    'cube': lambda z: z ** 3,
+}
+
+
+class Workspace(object):
+    # Scratch memory for the node values of BatchNetwork.activate(), shared by every network of the process
+    # Every frame of every generation reuses the same block instead of allocating a new array, and the block only
+    # grows when a larger generation needs more, so it never takes more than the largest generation needs.
+    # Only the zero slot has to be cleared, every other slot is written before it is read.
+    # activate() is only ever called from one thread at a time (the one training), which is all this allows.
+
+    def __init__(self):
+        self.storage = np.empty(0)
+
+    def values(self, n, num_slots):
+        size = n * num_slots
+        if len(self.storage) < size:
+            self.storage = np.empty(size)
+        values = self.storage[:size].reshape(n, num_slots)
+        values[:, 0] = 0.0
+        return values
+
+
+WORKSPACE = Workspace()
+
+
+class BatchNetwork(object):
+    # All the feed-forward networks of a generation, packed into NumPy arrays so they can be evaluated together
+    # Calling neat.nn.FeedForwardNetwork.activate once per bird per frame is slow pure-Python work.
+    # Here every genome gets one row in a set of padded arrays instead:
+        # values: one slot per node of the network. Slot 0 is always zero, the inputs follow, then the hidden and output nodes
+        # sources/weights: for every layer and every node in it, the slots it reads from and the weight of each link
+        # biases/responses/activations: the remaining node genes, for every layer and every node in it
+        # targets: the slot every node writes its result to
+    # Shorter networks are padded with links that read the zero slot with weight 0, and padding nodes write
+    # to a spare slot at the end that nothing reads, so one forward pass per layer evaluates every network at once.
+
+    def __init__(self, num_inputs, sources, weights, biases, responses, activations, targets, outputs, functions):
+        self.num_inputs = num_inputs
+        self.sources = sources
+        self.weights = weights
+        self.biases = biases
+        self.responses = responses
+        self.activations = activations
+        self.targets = targets
+        self.outputs = outputs
+        self.functions = functions
+        self.num_slots = int(max(targets.max(initial=0), outputs.max(initial=0), num_inputs)) + 1
+
+        # Packed arrays of the rows asked for last, reused while the same birds are alive
+        self._rows = None
+        self._subset = None
+
+    def __len__(self):
+        return len(self.outputs)
+
+    def activate(self, inputs, rows=None):
+        # Evaluate many networks at once
+        # inputs: array with one row of input values per network
+        # rows: which networks to evaluate (indexes into the genome list), all of them if None
+        # Returns an array with one row of output values per network
+        sources, weights, biases, responses, activations, targets, outputs = self._select(rows)
+        inputs = np.asarray(inputs, dtype=np.float64)
+        n = len(outputs)
+        if inputs.shape != (n, self.num_inputs):
+            raise RuntimeError("Expected {0:n}x{1:n} inputs, got {2!r}".format(n, self.num_inputs, inputs.shape))
+
+        values = WORKSPACE.values(n, self.num_slots)
+        values[:, 1:1 + self.num_inputs] = inputs
+
+        row = np.arange(n)[:, None]
+        for layer in range(sources.shape[1]):
+            # Weighted sum of the incoming links of every node in this layer, same as the 'sum' aggregation
+            # The links are added one at a time and in order, like sum() does, so the padding (which only adds zeros)
+            # can never change the rounding, whichever other networks happen to be packed alongside
+            products = values[row[:, :, None], sources[:, layer]] * weights[:, layer]
+            s = products[:, :, 0]
+            for link in range(1, products.shape[2]):
+                s = s + products[:, :, link]
+            z = biases[:, layer] + responses[:, layer] * s
+
+            if len(self.functions) == 1:
+                result = self.functions[0](z)
+            else:
+                result = np.empty_like(z)
+                for i, function in enumerate(self.functions):
+                    mask = activations[:, layer] == i
+                    result[mask] = function(z[mask])
+
+            values[row, targets[:, layer]] = result
+
+        return values[row, outputs]
+
+    def _select(self, rows):
+        # Packed arrays for the requested networks
+        # Birds only ever die during an episode, so the same subset is usually asked for many frames in a row
+        packed = (self.sources, self.weights, self.biases, self.responses,
+                  self.activations, self.targets, self.outputs)
+        if rows is None:
+            return packed
+
+        rows = np.asarray(rows)
+        if self._rows is None or not np.array_equal(self._rows, rows):
+            self._rows = rows.copy()
+            self._subset = tuple(a[rows] for a in packed)
+        return self._subset
+
+    @staticmethod
+    def create(genomes, config):
+        # Receives a list of genomes and returns their phenotypes packed into one BatchNetwork
+        # Follows neat.nn.FeedForwardNetwork.create, so every row computes the same network it would
+        genome_config = config.genome_config
+        input_keys = genome_config.input_keys
+        output_keys = genome_config.output_keys
+        num_inputs = len(input_keys)
+
+        # Single pass over the genomes: every node and every link is added to flat arrays, along with where it
+        # goes in the padded arrays. Only these compact records are kept, not the layers of every network, which
+        # would cost about a kilobyte per genome in Python objects, more than the padded arrays themselves.
+            # nodes: genome, layer, position in the layer, slot and activation of every node, with its bias and response
+            # links: genome, layer, position of the node, position of the link and source slot, with its weight
+        node_ints, node_floats = array('i'), array('d')
+        link_ints, link_weights = array('i'), array('d')
+        output_slots = array('i')
+        functions = []
+        max_layers = max_width = max_links = max_nodes = 1
+        for g, genome in enumerate(genomes):
+            connections = [cg.key for cg in genome.connections.values() if cg.enabled]
+            layers = feed_forward_layers(input_keys, output_keys, connections)
+
+            incoming = {}
+            for conn_key in connections:
+                incoming.setdefault(conn_key[1], []).append((conn_key[0], genome.connections[conn_key].weight))
+
+            # Slot 0 is the zero slot, the inputs take the next slots and the nodes follow in the order they are computed
+            slots = dict((key, 1 + i) for i, key in enumerate(input_keys))
+            for l, layer in enumerate(layers):
+                max_width = max(max_width, len(layer))
+                for k, node in enumerate(layer):
+                    ng = genome.nodes[node]
+                    if ng.aggregation != 'sum':
+                        raise ValueError("Only the 'sum' aggregation can be batched, got {0!r}".format(ng.aggregation))
+                    if ng.activation not in ACTIVATIONS:
+                        raise ValueError("No batched version of the {0!r} activation".format(ng.activation))
+                    if ng.activation not in functions:
+                        functions.append(ng.activation)
+
+                    slots[node] = 1 + len(slots)
+                    node_ints.extend((g, l, k, slots[node], functions.index(ng.activation)))
+                    node_floats.extend((ng.bias, ng.response))
+                    links = incoming.get(node, ())
+                    max_links = max(max_links, len(links))
+                    for f, (inode, weight) in enumerate(links):
+                        link_ints.extend((g, l, k, f, slots[inode]))
+                        link_weights.append(weight)
+
+            max_layers = max(max_layers, len(layers))
+            max_nodes = max(max_nodes, len(slots) - num_inputs)
+            # Output nodes that are not connected to anything stay at 0.0, like in FeedForwardNetwork
+            output_slots.extend(slots.get(key, 0) for key in output_keys)
+
+        # Scatter the records into the padded arrays
+        # The last slot catches the padding nodes. Slots are small numbers, so 32 bit indices are plenty.
+        spare = 1 + num_inputs + max_nodes
+        shape = (len(genomes), max_layers, max_width)
+        sources = np.zeros(shape + (max_links,), dtype=np.int32)
+        weights = np.zeros(shape + (max_links,))
+        biases = np.zeros(shape)
+        responses = np.zeros(shape)
+        activations = np.zeros(shape, dtype=np.int8)
+        targets = np.full(shape, spare, dtype=np.int32)
+        outputs = np.frombuffer(output_slots, dtype=np.intc).astype(np.int32).reshape(len(genomes), len(output_keys))
+
+        nodes = np.frombuffer(node_ints, dtype=np.intc).reshape(-1, 5)
+        node_values = np.frombuffer(node_floats, dtype=np.float64).reshape(-1, 2)
+        at = (nodes[:, 0], nodes[:, 1], nodes[:, 2])
+        targets[at] = nodes[:, 3]
+        activations[at] = nodes[:, 4]
+        biases[at] = node_values[:, 0]
+        responses[at] = node_values[:, 1]
+
+        links = np.frombuffer(link_ints, dtype=np.intc).reshape(-1, 5)
+        at = (links[:, 0], links[:, 1], links[:, 2], links[:, 3])
+        sources[at] = links[:, 4]
+        weights[at] = np.frombuffer(link_weights, dtype=np.float64)
+
+        return BatchNetwork(num_inputs, sources, weights, biases, responses, activations, targets, outputs,
+                            [ACTIVATIONS[name] for name in functions] or [ACTIVATIONS['tanh']])
@@ -0,0 +1,443 @@
+import os, random
+import numpy as np
+import pygame
+import neat
+import checkpoint
+from batch_network import BatchNetwork
+from fitness_cache import FitnessCache, genome_key
+from parallel import ParallelEvaluator
+from profiling import PhaseTimer, ProfileReporter
+from schedule import FullEpisode, SuccessiveHalving
+from spectator import SnapshotBuffer, Worker, watch
+from stats_log import StatsLog
+
+# Evaluates NEAT genomes by playing a game (see environment.py) with all of them at once
+    # Episode: one run of a game for a list of genomes, with all their networks evaluated together every frame
+    # simulate(): plays one episode and returns the fitness of every genome, as run by worker processes (see parallel.py)
+    # StageRunner: plays the stages of a schedule (see schedule.py) for the genomes of a generation
+    # evaluate(): the fitness of a whole generation, using the fitness cache, the schedule and the worker processes
+    # Spectator: shows training live from the main thread, while it runs on a background thread (see spectator.py)
+    # Runner: trains a population on a game, from the rendering options and the NEAT reporters to checkpoints
+# Games get created through their class, called make_env here, with the scenario of the episode (see environment.py)
+
+
+class Episode(object):
+    # One run of a game for a list of genomes
+    # The episode can be stopped at a score limit and carried on later with a higher one, and agents
+    # can be dropped from it along the way (see StageRunner)
+    # profiler: PhaseTimer the frames are timed with (see profiling.py), or None
+    # spectator: gets every frame published to it with spectator.publish(episode), or None
+
+    def __init__(self, env, genomes, config, profiler=None, spectator=None):
+        # One list, one game and one batch of networks created
+            # ge[] holds all the genomes associated to each agent (genome is a collection of genes)
+                ## In NEAT-python, a population of individual genomes is maintained.
+                ## Each genome contains 1) Node genes 2) Connection genes
+                ## The purpose is to identify useful genes (specific combinations of nodes and connections) over time
+            # nets contains all the neural networks that the agents use to decide their moves, packed together so they can all be evaluated in one go
+            # env holds the state of every agent of the generation, agent i belongs to ge[i] and row i of nets
+                ## Agents that are out are only marked as such in env.alive, so the three never have to be kept in sync by hand
+        self.env = env
+        self.ge = list(genomes)
+        self.nets = BatchNetwork.create(self.ge, config)
+        self.profiler = profiler
+        self.spectator = spectator
+        env.profiler = profiler
+        env.reset(len(self.ge))
+
+        # Every genome starts with fitness level of 0, it is collected here during the run
+        self.fitness = np.zeros(len(self.ge))
+
+    def run(self, max_score=20, render=False, top=None, fps=60):
+        # Play until every agent is out or the score goes past max_score
+        # render: draw the episode in the window at 'fps' frames per second, instead of running it as fast as possible
+        # top: only draw this many of the fittest agents alive, or all of them if None
+        env = self.env
+        clock = pygame.time.Clock()
+
+        while env.alive.any():
+            # Limit framerate to 30/60/120/etc
+            if render:
+                clock.tick(fps)
+
+            # Keep the window responsive, even while fast-forwarding
+            # A spectator does that on the main thread instead
+            if self.spectator is None and pygame.display.get_surface() is not None:
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT:
+                        pygame.quit()
+                        quit()
+
+            self.step()
+            if self.spectator is not None:
+                self.spectator.publish(self)
+
+            if render and env.alive.any():
+                if self.profiler is not None:
+                    self.profiler.lap(None)
+                env.draw(self.fittest(top), int(np.count_nonzero(env.alive)))
+                if self.profiler is not None:
+                    self.profiler.lap("draw")
+
+            # Stop simulation if score gets large enough
+            if env.score > max_score:
+                break
+
+    def step(self):
+        # Simulate one frame of the game for every agent alive
+        env, prof = self.env, self.profiler
+        if prof is not None:
+            prof.frame()
+            prof.lap(None)
+
+        self.reward(env.update())
+        if prof is not None:
+            prof.lap("physics")
+
+        # Every network of an agent that is still playing gets its inputs and produces its outputs, all in one go
+        agents = np.flatnonzero(env.alive)
+        outputs = self.nets.activate(env.observe(agents), agents)
+        if prof is not None:
+            prof.lap("activate")
+
+        self.reward(env.act(agents, outputs))
+        if prof is not None:
+            prof.lap("physics")
+
+    def reward(self, rewards):
+        # Add the rewards a game returned to the fitness of the agents, in order
+        fitness = self.fitness
+        for agents, amount in rewards:
+            fitness[agents] += amount
+
+    def fittest(self, top=None):
+        # Indices of the 'top' fittest agents alive in ascending order, or of all of them if None
+        alive = np.flatnonzero(self.env.alive)
+        if not top or len(alive) <= top:
+            return alive
+        if top == 1:
+            return alive[[np.argmax(self.fitness[alive])]]
+        return np.sort(alive[np.argpartition(-self.fitness[alive], top - 1)[:top]])
+
+    def drop(self, mask):
+        # Stop the selected agents without any penalty, they keep the fitness they have so far
+        self.env.alive[mask] = False
+
+    def results(self, details=False):
+        # The fitness of every genome, or (fitness, survived, clearance) tuples as used by the schedules in schedule.py
+        if details:
+            return list(zip(self.fitness.tolist(), self.env.alive.tolist(), self.env.clearance.tolist()))
+        return self.fitness.tolist()
+
+
+def simulate(genomes, config, make_env, scenario, max_score=20, details=False):
+    # Play one episode of the game with a list of genomes, and return the fitness of each of them
+    # max_score: the episode stops once the score goes past this
+    # details: return a (fitness, survived, clearance) tuple for every genome instead, as used by the schedules in schedule.py
+    # An agent's fitness only depends on its own genome and the scenario, so any split of a generation gives the same results
+    episode = Episode(make_env(scenario, details), genomes, config)
+    episode.run(max_score)
+    return episode.results(details)
+
+
+class StageRunner(object):
+    # Plays the stages of a schedule (see schedule.py) for the genomes of one generation
+    # With an evaluator (see parallel.py), every stage is simulated from the start again on the worker processes.
+    # In this process a single Episode is kept and carried on instead: the agents that were not promoted are
+    # dropped, and the others simply play on. Both give exactly the same results, since an agent's game only
+    # depends on its own genome and the scenario.
+    # render: draw the stages in the window, showing only the 'top' fittest agents alive if given (never with an evaluator)
+    # record: have the game of the episode played in this process keep what the agents did (see environment.py)
+
+    def __init__(self, make_env, genomes, config, scenario, evaluator=None, profiler=None, spectator=None,
+                 render=False, top=None, record=False):
+        self.make_env = make_env
+        self.genomes = genomes
+        self.config = config
+        self.scenario = scenario
+        self.evaluator = evaluator
+        self.profiler = profiler
+        self.spectator = spectator
+        self.render = render
+        self.top = top
+        self.record = record
+        self.episode = None
+
+    def __call__(self, genomes, max_score):
+        if self.evaluator is not None:
+            return self.evaluator.evaluate(genomes, self.config, self.make_env, self.scenario, max_score, True)
+
+        if self.episode is None:
+            self.episode = Episode(self.make_env(self.scenario, True, self.record), self.genomes, self.config,
+                                   self.profiler, self.spectator)
+        index = dict((id(genome), i) for i, genome in enumerate(self.genomes))
+        rows = [index[id(genome)] for genome in genomes]
+
+        playing = np.zeros(len(self.genomes), dtype=bool)
+        playing[rows] = True
+        self.episode.drop(~playing)
+        self.episode.run(max_score, self.render, self.top)
+
+        results = self.episode.results(details=True)
+        return [results[i] for i in rows]
+
+
+def evaluate(genomes, config, make_env, scenario, schedule, cache=None, evaluator=None, profiler=None,
+             spectator=None, render=False, top=None, played=None):
+    # The fitness of every genome of a generation, in order
+    # schedule: how long every genome gets to play (see schedule.py)
+    # cache: FitnessCache for genomes that played this scenario before, or None. Only for schedules that give every
+        ## genome the fitness it would get on its own (like FullEpisode), not ones that rank genomes against each other
+    # evaluator: ParallelEvaluator (see parallel.py) created with simulate(), or None to play in this process
+    # render: draw the generation on screen, showing only the 'top' fittest agents alive if given
+    # played: called with the Episode played in this process once the generation is done, if there was one. Its game
+        ## then also keeps what the agents did, so replays can be taken from it without playing anything again
+    fitness = [None] * len(genomes)
+
+    # Genomes that played this scenario before (the elites, mostly) get their fitness from the cache
+    # Rendered generations simulate every agent anyway, so the whole flock is on screen
+    if cache is not None:
+        cache.reset_counts()
+        keys = [genome_key(genome, scenario.seed, schedule.max_score) for genome in genomes]
+        if not render:
+            fitness = [cache.get(key) for key in keys]
+    todo = [i for i, f in enumerate(fitness) if f is None]
+
+    # The schedule decides how long every genome gets to play, rendered generations included
+    # Rendered generations are always simulated here, the window belongs to this process
+    final = [True] * len(genomes)
+    if not todo:
+        results = []
+    else:
+        playing = [genomes[i] for i in todo]
+        stages = StageRunner(make_env, playing, config, scenario, None if render else evaluator, profiler, spectator,
+                             render, top, played is not None)
+        scheduled = schedule.evaluate(playing, stages)
+        if played is not None and stages.episode is not None:
+            played(stages.episode)
+        results = [f for f, is_final in scheduled]
+        for i, (f, is_final) in zip(todo, scheduled):
+            final[i] = is_final
+    for i, f in zip(todo, results):
+        fitness[i] = f
+
+    if cache is not None:
+        for i in todo:
+            if final[i]:
+                cache.put(keys[i], fitness[i])
+        if not render:
+            print("Fitness cache: {0} hits, {1} misses".format(cache.hits, cache.misses))
+    return fitness
+
+
+class Spectator(object):
+    # Live view of a training run that does not slow it down (see spectator.py)
+    # Episodes publish a snapshot of every frame (see Environment.snapshot), and the main thread draws the newest one
+    # at display rate with draw(), which every game implements for its own snapshots
+    # top: only show this many of the fittest agents alive, or all of them if None
+    # Only episodes simulated in this process are shown, not those on worker processes
+
+    def __init__(self, top=1, capacity=8):
+        self.buffer = SnapshotBuffer(capacity)
+        self.top = top
+
+    def publish(self, episode):
+        self.buffer.publish(episode.env.snapshot(episode.fittest(self.top)))
+
+    def draw(self, snapshot):
+        raise NotImplementedError
+
+
+class Runner(object):
+    # Trains NEAT genomes on a game, one generation at a time, with the options of a training run
+    # game: the Environment class that is played (see environment.py)
+    # Rendering options, set by run()
+        # headless: never open a window, skip the frame limiter and all drawing
+        # render_every: only draw every Nth generation, the others are fast-forwarded
+        # render_best: only draw the fittest agent that is still alive
+    # Evaluation options, set by configure()
+        # seed: seed of the scenarios, every generation gets a new random scenario if None
+        # fresh: give every generation its own (seeded) scenario, instead of the same one for all of them
+        # cache: FitnessCache for genomes seen before, only used when every generation plays the same scenario
+        # schedule: how long every genome gets to play, see schedule.py
+    # Set by run() for as long as it runs
+        # evaluator: ParallelEvaluator that splits the generations over worker processes, or None
+        # profiler: PhaseTimer that the episodes report their phase times to, or None when profiling is off
+        # spectator: the game's Spectator, or None
+        # record: keep the Episode every generation was played in, in 'episode' (None if it was played elsewhere),
+            ## with its game keeping what the agents did, for replays
+    # generation: number of generations evaluated so far, scenario: the one the last generation played
+    # config: the NEAT config of the last run()
+
+    def __init__(self, game):
+        self.game = game
+        self.headless = False
+        self.render_every = 1
+        self.render_best = False
+        self.evaluator = None
+        self.profiler = None
+        self.spectator = None
+        self.record = False
+        self.episode = None
+        self.config = None
+        self.configure()
+
+    def configure(self, seed=None, fresh=False, cache_size=1024, max_score=20, halving_stages=1):
+        # Set up how eval_genomes() evaluates generations, starting again from the first generation
+        # The arguments are the same as those of run()
+        self.seed, self.fresh = seed, fresh
+        self.scenario, self.generation = None, 0
+
+        if halving_stages > 1:
+            self.schedule = SuccessiveHalving(max_score, halving_stages)
+        else:
+            self.schedule = FullEpisode(max_score)
+
+        # Fitness can only be reused if the scenario does not change between generations
+        # Successive halving promotes agents by how they rank against the rest of the generation, so a genome's
+        # fitness depends on who it plays with, and genomes taken from the cache would be missing from that ranking
+        self.cache = None
+        if cache_size > 0 and seed is not None and not fresh and halving_stages <= 1:
+            self.cache = FitnessCache(cache_size)
+
+    def should_render(self, generation):
+        # Decide whether the given generation is drawn on screen or fast-forwarded
+        # With a spectator, the simulation never draws itself, the spectator does
+        if self.headless or pygame.display.get_surface() is None or self.spectator is not None:
+            return False
+        return (generation - 1) % max(self.render_every, 1) == 0
+
+    def eval_genomes(self, genomes, config):
+        # Fitness function for neat.Population.run()
+        self.generation += 1
+
+        # Every agent of a generation plays the same scenario, generated up front
+        # Handing the whole scenario around lets worker processes play the exact same one
+        if self.scenario is None or self.seed is None or self.fresh:
+            self.scenario = self.game.scenario(self.seed, self.generation, self.fresh)
+
+        ge = [genome for genome_id, genome in genomes]
+        played = []
+        fitness = evaluate(ge, config, self.game, self.scenario, self.schedule, self.cache, self.evaluator,
+                           self.profiler, self.spectator, render=self.should_render(self.generation),
+                           top=1 if self.render_best else None, played=played.append if self.record else None)
+        self.episode = played[0] if played else None
+        for genome, f in zip(ge, fitness):
+            genome.fitness = f
+
+    def run(self, config_file, generations=50, headless=False, render_every=1, render_best=False, workers=1,
+            seed=None, fresh=False, cache_size=1024, max_score=20, halving_stages=1, profile=None, spectate=None,
+            checkpoint_every=5, resume=None, reporters=(), record=False):
+        # Train a population for up to 'generations' generations (counting the ones done before resuming),
+        # and return the winner
+        # headless: train without a window, as fast as possible
+        # render_every: draw only every Nth generation, fast-forwarding the rest
+        # render_best: draw only the fittest agent alive instead of all of them
+        # workers: number of processes to split the generations over, 0 uses every core
+            ## Generations that are drawn are always played in this process, so none are started if every one is drawn
+        # seed: makes the run reproducible, every generation plays the scenario with this seed
+        # fresh: with a seed, give every generation its own reproducible scenario instead
+        # cache_size: how many fitness values to remember when every generation plays the same scenario, 0 turns the cache off
+        # max_score: an episode ends once the score goes past this
+        # halving_stages: with more than one stage, only the best agents of each stage play on in the next, longer one (see schedule.py)
+        # profile: report where the time of every generation goes (True), and also append it to a log file if this is its path (.csv or .json)
+        # spectate: train on a background thread as fast as possible, and show the fittest 'spectate' agents live (0 shows all of them)
+        # checkpoint_every: save a checkpoint every N generations (see checkpoint.py), 0 turns it off
+        # resume: path of a checkpoint to carry on from, its seed and scenario settings replace the ones given here
+        # reporters: more NEAT reporters for the population, they see every generation before the profiler does
+        # record: keep the episode of every generation played in this process in 'episode', for replays
+        state = None
+        if resume:
+            state = checkpoint.load(resume)
+            # Checkpoints saved before the runner was split from Flappy Bird named the scenario after its courses
+            extra = state["extra"]
+            for old, new in (("gen", "generation"), ("fresh_course", "fresh"), ("course_seed", "scenario_seed")):
+                if old in extra:
+                    extra[new] = extra.pop(old)
+            seed, fresh = extra["seed"], extra["fresh"]
+            print("Resuming from {0} after {1} generations".format(resume, state["generation"]))
+
+        self.headless, self.render_every, self.render_best = headless, render_every, render_best
+        self.record, self.episode = record, None
+        self.configure(seed, fresh, cache_size, max_score, halving_stages)
+        if not headless:
+            self.game.open_window()
+        if seed is not None:
+            random.seed(seed)
+
+        # Rendered generations are played in this process, so workers only help if some generations are not drawn
+        every_generation_drawn = not headless and spectate is None and render_every <= 1
+        if workers != 1 and every_generation_drawn:
+            print("Workers: every generation is drawn in this process, so no workers are started "
+                  "(train with --headless, --render-every N or --spectate to use them)")
+        elif workers != 1:
+            # Workers only simulate, they never draw, so keep them quiet and windowless
+            os.environ["PYGAME_HIDE_SUPPORT_PROMPT"] = "1"
+            self.evaluator = ParallelEvaluator(workers or os.cpu_count(), simulate)
+
+        config = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                                    neat.DefaultSpeciesSet, neat.DefaultStagnation,
+                                    config_file)
+        self.config = config
+
+        # Create the population, or carry on with the one from the checkpoint
+        stats = neat.StatisticsReporter()
+        if state is None:
+            p = neat.Population(config)
+        else:
+            p = checkpoint.restore(state, config, stats)
+            self.generation = state["extra"]["generation"]
+            if state["extra"]["scenario_seed"] is not None:
+                self.scenario = self.game.scenario(state["extra"]["scenario_seed"], self.generation)
+
+        # Add a stdout reporter to show progress in the terminal.
+        p.add_reporter(neat.StdOutReporter(True))
+        p.add_reporter(stats)
+        # Fitness statistics are also appended to fitness_log/ as every generation ends (see stats_log.py), unlike stats.save()
+        stats_log = StatsLog("fitness_log", keep=p.generation)
+        p.add_reporter(stats_log)
+        for reporter in reporters:
+            p.add_reporter(reporter)
+        self.profiler = None
+        if profile:
+            self.profiler = PhaseTimer()
+            p.add_reporter(ProfileReporter(self.profiler, profile if isinstance(profile, str) else None))
+        checkpointer = None
+        if checkpoint_every > 0:
+            checkpointer = checkpoint.Checkpointer(p, checkpoint_every, stats=stats, extra=lambda: dict(
+                generation=self.generation, seed=self.seed, fresh=self.fresh,
+                scenario_seed=self.scenario.seed if self.scenario is not None else None))
+            p.add_reporter(checkpointer)
+
+        # A spectator moves training to a background thread, and keeps the main thread for the window
+        self.spectator = None
+        if spectate is not None and not headless:
+            self.spectator = self.game.spectator(spectate or None)
+        try:
+            if self.spectator is None:
+                winner = p.run(self.eval_genomes, generations - p.generation)
+            else:
+                worker = Worker(p.run, self.eval_genomes, generations - p.generation)
+                worker.start()
+                if not watch(self.spectator.buffer, worker, self.spectator.draw):
+                    pygame.quit()
+                    quit()
+                worker.join()
+                if worker.error is not None:
+                    raise worker.error
+                winner = worker.result
+                print("Spectator: drew {0} of {1} frames".format(
+                    self.spectator.buffer.published - self.spectator.buffer.dropped, self.spectator.buffer.published))
+        finally:
+            self.spectator = None
+            self.record = False
+            stats_log.close()
+            if checkpointer is not None:
+                checkpointer.close()
+            if self.evaluator is not None:
+                self.evaluator.close()
+                self.evaluator = None
+        stats.save()
+        # show final stats
+        print('\nBest genome:\n{!s}'.format(winner))
+        return winner
@@ -0,0 +1,234 @@
+import argparse, json, multiprocessing, os, platform, random, resource, sys, time
+import numpy as np
+import neat
+
+import flappy_bird
+from batch_network import BatchNetwork
+from compiler import CompiledNetwork
+from course import Course
+from flappy_bird import Bird, BirdPopulation, Episode, Pipe
+
+# Benchmarks for the hot paths of the simulation
+# Everything runs headless on a seeded course with seeded genomes, so two runs on the same machine measure the same work.
+# Results are written to a JSON file. Given a baseline file from an earlier run, every metric is compared against it,
+# and the script exits with status 1 if any of them got slower by more than the threshold. Timings also record their
+# spread (how much slower the slowest run was than the fastest one), and the noise both runs measured is allowed on
+# top of the threshold, so two runs of the same code do not fail the comparison.
+
+DEFAULT_SIZES = (10, 100, 1000, 10000)
+# Population size the peak memory of a whole generation is measured for
+MEMORY_SIZE = 50000
+
+
+def timed(function, repeat=5, count=None, unit="sec"):
+    # A metric from several runs of function(), the fastest run counts (it is the one least disturbed by the rest of the system)
+    # count: report count / fastest time as a rate (higher is better), instead of the fastest time in seconds
+    # One untimed run first, so lazily built things (like the collision span tables) are not counted
+    function()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    fastest = min(times)
+    spread = max(times) / fastest - 1
+    if count is None:
+        return dict(value=fastest, unit=unit, higher_is_better=False, spread=spread)
+    return dict(value=count / fastest, unit=unit, higher_is_better=True, spread=spread)
+
+
+def make_genomes(config, count, seed):
+    # A freshly initialized population, the same one for the same seed
+    random.seed(seed)
+    genomes = []
+    for key in range(count):
+        genome = config.genome_type(key)
+        genome.configure_new(config.genome_config)
+        genomes.append(genome)
+    return genomes
+
+
+def bench_bird_move(repeat):
+    birds = [Bird(230, 350) for _ in range(1000)]
+
+    def move():
+        for bird in birds:
+            bird.move()
+    return timed(move, repeat, 1000, "moves/sec")
+
+
+def bench_population_move(repeat):
+    birds = BirdPopulation(10000, 230, 350)
+    return timed(birds.move, repeat, 10000, "bird moves/sec")
+
+
+def bench_pipe_collide(repeat):
+    # Birds spread over the height of the screen, right next to the pipe so the broad phase does not skip them
+    pipe = Pipe(200, 300)
+    birds = [Bird(230, y) for y in range(0, 700, 7)]
+
+    def collide():
+        for bird in birds:
+            pipe.collide(bird, None)
+    return timed(collide, repeat, len(birds), "checks/sec")
+
+
+def bench_pipe_collide_all(repeat):
+    pipe = Pipe(200, 300)
+    birds = BirdPopulation(10000, 230, 350)
+    birds.y = np.linspace(0, 700, len(birds))
+    return timed(lambda: pipe.collide_all(birds), repeat, len(birds), "checks/sec")
+
+
+def bench_activate(config, seed, repeat):
+    nets = [neat.nn.FeedForwardNetwork.create(g, config) for g in make_genomes(config, 1000, seed)]
+    inputs = (350.0, 120.0, 80.0)
+
+    def activate():
+        for net in nets:
+            net.activate(inputs)
+    return timed(activate, repeat, len(nets), "activations/sec")
+
+
+def bench_compiled_activate(config, seed, repeat):
+    nets = [CompiledNetwork.create(g, config) for g in make_genomes(config, 1000, seed)]
+    inputs = (350.0, 120.0, 80.0)
+
+    def activate():
+        for net in nets:
+            net.activate(inputs)
+    return timed(activate, repeat, len(nets), "activations/sec")
+
+
+def bench_batch_activate(config, seed, repeat):
+    nets = BatchNetwork.create(make_genomes(config, 10000, seed), config)
+    inputs = np.tile([350.0, 120.0, 80.0], (len(nets), 1))
+    return timed(lambda: nets.activate(inputs), repeat, len(nets), "activations/sec")
+
+
+def bench_steps(config, seed, repeat, frames=200):
+    # Frames per second of the episode loop, with a thousand birds that are kept alive the whole time
+    genomes = make_genomes(config, 1000, seed)
+
+    def steps():
+        episode = Episode(genomes, config, Course(seed))
+        for _ in range(frames):
+            episode.birds.alive[:] = True
+            episode.step()
+    return timed(steps, repeat, frames, "steps/sec")
+
+
+def bench_generation(config, seed, size, repeat):
+    # Wall time of evaluating a whole generation, network creation included
+    genomes = make_genomes(config, size, seed)
+    course = Course(seed)
+    return timed(lambda: flappy_bird.simulate(genomes, config, course), repeat)
+
+
+def peak_rss():
+    # Highest resident set size of this process so far, in MB (ru_maxrss is in kilobytes on Linux, bytes on macOS)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def measure_generation_memory(config_file, seed, size):
+    # Body of the process measuring memory: peak RSS once the genomes exist, and at the end of the generation
+    config = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                                neat.DefaultSpeciesSet, neat.DefaultStagnation,
+                                config_file)
+    flappy_bird.simulate(make_genomes(config, 10, seed), config, Course(seed))
+    genomes = make_genomes(config, size, seed)
+    before = peak_rss()
+    flappy_bird.simulate(genomes, config, Course(seed))
+    return before, peak_rss()
+
+
+def bench_memory(config_file, seed, size=MEMORY_SIZE):
+    # Peak memory of evaluating a whole generation of 'size' birds
+    # The peak RSS of a process never goes down, so this runs in a fresh process of its own. Two metrics:
+        # peak_rss: the whole process, the genomes included (NEAT's genome objects are most of it)
+        # evaluate_rss: how far evaluating the generation raised the peak above what the genomes already took
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        before, after = pool.apply(measure_generation_memory, (config_file, seed, size))
+    return {"generation_{0}_peak_rss".format(size): dict(value=after, unit="MB", higher_is_better=False),
+            "generation_{0}_evaluate_rss".format(size): dict(value=after - before, unit="MB", higher_is_better=False)}
+
+
+def run_benchmarks(config_file, sizes=DEFAULT_SIZES, seed=0, repeat=5, memory_size=MEMORY_SIZE):
+    # Returns a dict of metric name -> dict(value, unit, higher_is_better)
+    config = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                                neat.DefaultSpeciesSet, neat.DefaultStagnation,
+                                config_file)
+    results = {}
+    results["bird_move"] = bench_bird_move(repeat)
+    results["population_move"] = bench_population_move(repeat)
+    results["pipe_collide"] = bench_pipe_collide(repeat)
+    results["pipe_collide_all"] = bench_pipe_collide_all(repeat)
+    results["feedforward_activate"] = bench_activate(config, seed, repeat)
+    results["compiled_activate"] = bench_compiled_activate(config, seed, repeat)
+    results["batch_activate"] = bench_batch_activate(config, seed, repeat)
+    results["eval_steps"] = bench_steps(config, seed, repeat)
+    for size in sizes:
+        results["generation_{0}".format(size)] = bench_generation(config, seed, size, repeat)
+    if memory_size:
+        results.update(bench_memory(config_file, seed, memory_size))
+    return results
+
+
+def compare(results, baseline, threshold):
+    # Returns the metrics that got slower than the baseline by more than threshold (0.1 = 10%), with their slowdown
+    # The spread measured by either run is allowed on top of the threshold, a slowdown within it may just be noise
+    regressions = {}
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None or not base["value"] or not result["value"]:
+            continue
+        if result["higher_is_better"]:
+            slowdown = base["value"] / result["value"] - 1
+        else:
+            slowdown = result["value"] / base["value"] - 1
+        if slowdown > threshold + result.get("spread", 0) + base.get("spread", 0):
+            regressions[name] = slowdown
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the simulation hot paths")
+    parser.add_argument("--output", default="benchmark.json", help="file the results are written to")
+    parser.add_argument("--baseline", default=None, help="results of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="allowed slowdown against the baseline before failing (0.1 = 10%%), "
+                             "on top of the spread both runs measured")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES),
+                        help="population sizes to time whole generations for")
+    parser.add_argument("--memory-size", type=int, default=MEMORY_SIZE, metavar="N",
+                        help="population size to measure the peak memory of a generation for (0 skips it)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per measurement, the fastest one counts")
+    args = parser.parse_args(argv)
+
+    local_dir = os.path.dirname(os.path.abspath(__file__))
+    results = run_benchmarks(os.path.join(local_dir, 'config-feedforward.txt'), args.sizes, args.seed, args.repeat,
+                             args.memory_size)
+
+    for name, result in results.items():
+        spread = " (spread {0:.1%})".format(result["spread"]) if "spread" in result else ""
+        print("{0:<32} {1:>14.6g} {2}{3}".format(name, result["value"], result["unit"], spread))
+
+    with open(args.output, "w") as f:
+        json.dump(dict(python=platform.python_version(), machine=platform.machine(), seed=args.seed,
+                       results=results), f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        for name, slowdown in sorted(regressions.items()):
+            print("REGRESSION {0}: {1:.1%} slower than the baseline".format(name, slowdown))
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
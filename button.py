@@ -6,7 +6,10 @@ class Button():
 		self.font = font
 		self.base_color, self.hovering_color = base_color, hovering_color
 		self.text_input = text_input
-		self.text = self.font.render(self.text_input, True, self.base_color)
+		# The text is rendered once in each color, hovering only switches between the two
+		self.base_text = self.font.render(self.text_input, True, self.base_color)
+		self.hover_text = self.font.render(self.text_input, True, self.hovering_color)
+		self.text = self.base_text
 		if self.image is None:
 			self.image = self.text
 		self.rect = self.image.get_rect(center=(self.x_pos, self.y_pos))
@@ -18,12 +21,11 @@ class Button():
 		screen.blit(self.text, self.text_rect)
 
 	def checkForInput(self, position):
-		if position[0] in range(self.rect.left, self.rect.right) and position[1] in range(self.rect.top, self.rect.bottom):
-			return True
-		return False
+		return bool(self.rect.collidepoint(position))
 
 	def changeColor(self, position):
-		if position[0] in range(self.rect.left, self.rect.right) and position[1] in range(self.rect.top, self.rect.bottom):
-			self.text = self.font.render(self.text_input, True, self.hovering_color)
-		else:
-			self.text = self.font.render(self.text_input, True, self.base_color)
\ No newline at end of file
+		# Returns True if the button looks different now, and has to be drawn again
+		text = self.hover_text if self.checkForInput(position) else self.base_text
+		changed = text is not self.text
+		self.text = text
+		return changed
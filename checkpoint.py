@@ -0,0 +1,127 @@
+import glob, itertools, os, pickle, random, re, zlib
+from concurrent.futures import ThreadPoolExecutor
+import neat
+
+# Saving and resuming training runs
+# A checkpoint holds everything the next generation depends on: the population, the species, the counters NEAT
+# numbers new genomes, nodes and species with, the best genome so far, the state of the random number generator,
+# and whatever the caller adds (the generation counter and scenario seed of batch_runner.Runner, for example).
+# Resuming from it continues exactly like the run it was taken from would have.
+# The state is pickled in memory at the end of a generation (which is quick), and compressed and written to disk
+# on a background thread, so the simulation never waits for the disk.
+# File format: the MAGIC bytes, followed by the zlib compressed pickle of a dict
+
+MAGIC = b"FBCKPT1\n"
+
+
+def next_value(owner, name):
+    # The value an itertools.count attribute will produce next, without using it up
+    # (the counter is replaced by a fresh one starting at that value)
+    counter = getattr(owner, name)
+    if counter is None:
+        return None
+    value = next(counter)
+    setattr(owner, name, itertools.count(value))
+    return value
+
+
+def counter(value):
+    return None if value is None else itertools.count(value)
+
+
+class Checkpointer(neat.reporting.BaseReporter):
+    # NEAT reporter that saves a checkpoint every 'interval' generations
+    # population: the neat.Population being run, stats: its neat.StatisticsReporter, if its history should be kept
+    # extra: function returning a dict of anything else to save, handed back by load() under "extra"
+    # Files are named prefix + number of generations done + ".bin"
+
+    def __init__(self, population, interval=5, prefix="checkpoint-", stats=None, extra=None):
+        self.population = population
+        self.interval = interval
+        self.prefix = prefix
+        self.stats = stats
+        self.extra = extra
+        self.writer = ThreadPoolExecutor(max_workers=1)
+        self.pending = []
+
+    def end_generation(self, config, population, species_set):
+        done = self.population.generation + 1
+        if done % self.interval == 0:
+            self.save("{0}{1}.bin".format(self.prefix, done), self.state(config, done))
+
+    def state(self, config, done):
+        p = self.population
+        state = dict(generation=done, population=p.population, best_genome=p.best_genome,
+                     species=p.species.species, genome_to_species=p.species.genome_to_species,
+                     next_species=next_value(p.species, "indexer"),
+                     next_genome=next_value(p.reproduction, "genome_indexer"),
+                     next_node=next_value(config.genome_config, "node_indexer"),
+                     random=random.getstate(), statistics=None, extra=None)
+        if self.stats is not None:
+            state["statistics"] = (self.stats.most_fit_genomes, self.stats.generation_statistics)
+        if self.extra is not None:
+            state["extra"] = self.extra()
+        return state
+
+    def save(self, path, state):
+        # Pickle now, while the state is what it is at the end of this generation, and write it in the background
+        data = pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+        self.pending = [f for f in self.pending if not f.done()]
+        self.pending.append(self.writer.submit(write, path, data))
+        print("Saving checkpoint to {0}".format(path))
+
+    def close(self):
+        # Wait for the checkpoints still being written, and report any that failed
+        self.writer.shutdown(wait=True)
+        for future in self.pending:
+            future.result()
+        self.pending = []
+
+
+def write(path, data):
+    # Written to a temporary file first, so an interrupted write never leaves a broken checkpoint behind
+    temp = path + ".tmp"
+    with open(temp, "wb") as f:
+        f.write(MAGIC)
+        f.write(zlib.compress(data))
+    os.replace(temp, path)
+
+
+def load(path):
+    # The state dict saved by a Checkpointer
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(MAGIC):
+        raise ValueError("{0} is not a checkpoint file".format(path))
+    return pickle.loads(zlib.decompress(data[len(MAGIC):]))
+
+
+def restore(state, config, stats=None):
+    # A neat.Population that continues from a loaded state, also restoring the random number generator
+    # config must be the config of the run the checkpoint was taken from
+    # stats: a neat.StatisticsReporter to give the saved history back to
+    species_set = config.species_set_type(config.species_set_config, None)
+    population = neat.Population(config, (state["population"], species_set, state["generation"]))
+    species_set.reporters = population.reporters
+    species_set.species = state["species"]
+    species_set.genome_to_species = state["genome_to_species"]
+    species_set.indexer = counter(state["next_species"])
+    population.reproduction.genome_indexer = counter(state["next_genome"])
+    population.best_genome = state["best_genome"]
+    config.genome_config.node_indexer = counter(state["next_node"])
+    if stats is not None and state["statistics"] is not None:
+        stats.most_fit_genomes, stats.generation_statistics = state["statistics"]
+    random.setstate(state["random"])
+    return population
+
+
+def latest(prefix="checkpoint-"):
+    # Path of the checkpoint written last, or None if there is none
+    # Finished runs leave their checkpoints behind, so the one with the most generations done may well be from an
+    # older run than the one that was interrupted. Files written within the same clock tick go by generation.
+    found = []
+    for path in glob.glob(glob.escape(prefix) + "*.bin"):
+        match = re.match(re.escape(prefix) + r"(\d+)\.bin$", path)
+        if match:
+            found.append((os.path.getmtime(path), int(match.group(1)), path))
+    return max(found)[2] if found else None
@@ -0,0 +1,113 @@
+import numpy as np
+
+# Pixel perfect collision checks that work on a whole population of birds at once
+# pygame masks answer "do these two sprites overlap?" for one pair of sprites at a time.
+# Here the opaque pixels of every row of a sprite are stored as column ranges (spans) instead,
+# so an overlap test becomes a handful of integer comparisons that NumPy can run for every bird in one go.
+# The result is the same as pygame.mask.Mask.overlap() for the same sprites and offsets.
+
+# Empty span padding: starts after it ends, so it never overlaps anything
+EMPTY_LEFT = 1 << 30
+EMPTY_RIGHT = -(1 << 30)
+# Candidates checked together in the narrow phase of overlap()
+# Its temporary arrays grow with the number of candidates, checking them in blocks keeps that bounded for any population
+BLOCK = 4096
+
+
+class SpanTable(object):
+    # The opaque pixels of a sprite, row by row
+    # left[row, i] and right[row, i] are the first and last column of the i-th run of set bits in that row
+    # Rows with fewer runs than the widest row are padded with empty spans
+    # Columns are stored as 32 bit integers, which is plenty for anything on screen and halves the narrow phase's memory
+
+    def __init__(self, left, right, width, height):
+        self.left = left
+        self.right = right
+        self.width = width
+        self.height = height
+
+    @staticmethod
+    def from_mask(mask):
+        # Build the table from a pygame mask (for example pygame.mask.from_surface(image))
+        width, height = mask.get_size()
+        rows = []
+        for y in range(height):
+            runs = []
+            start = None
+            for x in range(width):
+                if mask.get_at((x, y)):
+                    if start is None:
+                        start = x
+                elif start is not None:
+                    runs.append((start, x - 1))
+                    start = None
+            if start is not None:
+                runs.append((start, width - 1))
+            rows.append(runs)
+
+        num_runs = max(1, max(len(runs) for runs in rows))
+        left = np.full((height, num_runs), EMPTY_LEFT, dtype=np.int32)
+        right = np.full((height, num_runs), EMPTY_RIGHT, dtype=np.int32)
+        for y, runs in enumerate(rows):
+            for i, (start, end) in enumerate(runs):
+                left[y, i] = start
+                right[y, i] = end
+        return SpanTable(left, right, width, height)
+
+    @staticmethod
+    def stack(tables):
+        # Combine the tables of several same-sized sprites (like the animation frames of a bird) into one
+        # The result has an extra leading axis to pick the sprite with
+        num_runs = max(t.left.shape[1] for t in tables)
+        left = np.full((len(tables), tables[0].height, num_runs), EMPTY_LEFT, dtype=np.int32)
+        right = np.full((len(tables), tables[0].height, num_runs), EMPTY_RIGHT, dtype=np.int32)
+        for i, t in enumerate(tables):
+            left[i, :, :t.left.shape[1]] = t.left
+            right[i, :, :t.right.shape[1]] = t.right
+        return SpanTable(left, right, tables[0].width, tables[0].height)
+
+
+def overlap(sprites, frames, x, ys, other, other_x, other_y):
+    # Check many sprites of the same kind against one other sprite
+    # sprites: stacked SpanTable of the possible images (for example the bird animation frames)
+    # frames: which image every sprite currently shows
+    # x: the column every sprite is at (all of them share it), ys: the row of every sprite
+    # other: SpanTable of the sprite to check against, placed at (other_x, other_y)
+    # Returns a boolean array, True for the sprites that overlap the other sprite
+    ys = np.asarray(ys, dtype=np.int64)
+    hit = np.zeros(len(ys), dtype=bool)
+
+    # Broad phase, horizontal: all sprites share the same columns, so one comparison rules out all of them
+    if x + sprites.width <= other_x or other_x + other.width <= x:
+        return hit
+
+    # Broad phase, vertical: only the sprites whose bounding box overlaps the rows of the other sprite are checked further
+    candidates = np.flatnonzero((ys + sprites.height > other_y) & (ys < other_y + other.height))
+    if len(candidates) == 0:
+        return hit
+
+    # Narrow phase: compare the spans of every row of every candidate with the spans of the matching row of the other sprite
+    frames = np.asarray(frames)
+    for start in range(0, len(candidates), BLOCK):
+        block = candidates[start:start + BLOCK]
+        hit[block] = narrow_phase(sprites, frames[block], x, ys[block], other, other_x, other_y)
+    return hit
+
+
+def narrow_phase(sprites, frames, x, ys, other, other_x, other_y):
+    # The pixel exact part of overlap(), for sprites that passed the broad phase
+    rows = np.arange(sprites.height)
+    other_rows = ys[:, None] + rows - other_y
+    valid = (other_rows >= 0) & (other_rows < other.height)
+    other_rows = np.clip(other_rows, 0, other.height - 1)
+
+    # Spans in screen columns, shaped (sprite, row, run)
+    left = sprites.left[frames] + x
+    right = sprites.right[frames] + x
+    other_left = other.left[other_rows] + other_x
+    other_right = other.right[other_rows] + other_x
+
+    # Two spans overlap when the later start is not past the earlier end
+    touching = (np.maximum(left[:, :, :, None], other_left[:, :, None, :]) <=
+                np.minimum(right[:, :, :, None], other_right[:, :, None, :]))
+    return (touching.any(axis=(2, 3)) & valid).any(axis=1)
@@ -0,0 +1,86 @@
+import math, sys
+from collections import OrderedDict
+import neat
+from fitness_cache import genome_key
+
+# Turns a genome into a plain Python function that computes its network, for activating one network at a time
+# neat.nn.FeedForwardNetwork.activate() walks a generic list of nodes and links on every call. The compiled
+# function is the same computation written out line by line, with the weights as constants, e.g.
+#     def activate(inputs):
+#         n0, n1, n2, = inputs
+#         v0 = tanh(max(-60.0, min(60.0, 2.5 * (-0.53 + 1.0 * (0 + n0 * 0.42 + n2 * -1.7)))))
+#         return [v0]
+# Every operation happens in the same order as in FeedForwardNetwork, so the outputs are exactly the same.
+# (For whole generations at once, see batch_network.py instead.)
+
+# Before Python 3.12, sum() over floats adds them one by one from 0, so writing the sum out gives the same result.
+# From 3.12 on it uses compensated summation, so the compiled code calls sum() as well.
+INLINE_SUM = sys.version_info < (3, 12)
+
+# The common activation functions are written out in place, the same way neat.activations computes them
+INLINE_ACTIVATIONS = {
+    neat.activations.tanh_activation: "tanh(max(-60.0, min(60.0, 2.5 * {0})))",
+    neat.activations.sigmoid_activation: "1.0 / (1.0 + exp(-max(-60.0, min(60.0, 5.0 * {0}))))",
+    neat.activations.clamped_activation: "max(-1.0, min(1.0, {0}))",
+    neat.activations.identity_activation: "{0}",
+}
+
+# Compiled functions by genome_key(), least recently used first, so elites are only compiled once
+CACHE = OrderedDict()
+CACHE_SIZE = 1024
+
+
+def generate(net):
+    # Source code and constants of the function computing a neat.nn.FeedForwardNetwork
+    names = dict((key, "n{0}".format(i)) for i, key in enumerate(net.input_nodes))
+    # (inf and nan, in case a weight ever is one, since that is how repr() writes them)
+    namespace = dict(tanh=math.tanh, exp=math.exp, max=max, min=min, inf=math.inf, nan=math.nan)
+    lines = ["def activate(inputs):",
+             "    if len(inputs) != {0}:".format(len(net.input_nodes)),
+             "        raise RuntimeError('Expected {0} inputs, got {{0}}'.format(len(inputs)))".format(len(net.input_nodes)),
+             "    {0}, = inputs".format(", ".join(names[key] for key in net.input_nodes))]
+
+    for i, (node, act_func, agg_func, bias, response, links) in enumerate(net.node_evals):
+        terms = ["{0} * {1!r}".format(names[source], weight) for source, weight in links]
+        if agg_func is neat.aggregations.sum_aggregation and INLINE_SUM:
+            total = "(" + " + ".join(["0"] + terms) + ")"
+        else:
+            namespace["agg{0}".format(i)] = agg_func
+            total = "agg{0}([{1}])".format(i, ", ".join(terms))
+        z = "{0!r} + {1!r} * {2}".format(bias, response, total)
+        if act_func in INLINE_ACTIVATIONS:
+            value = INLINE_ACTIVATIONS[act_func].format("(" + z + ")")
+        else:
+            namespace["act{0}".format(i)] = act_func
+            value = "act{0}({1})".format(i, z)
+        names[node] = "v{0}".format(i)
+        lines.append("    {0} = {1}".format(names[node], value))
+
+    # Outputs that nothing is connected to are never computed, and stay at 0.0 like in FeedForwardNetwork
+    lines.append("    return [{0}]".format(", ".join(names.get(key, "0.0") for key in net.output_nodes)))
+    return "\n".join(lines) + "\n", namespace
+
+
+class CompiledNetwork(object):
+    # Drop-in replacement for neat.nn.FeedForwardNetwork: create(genome, config), then activate(inputs)
+
+    def __init__(self, activate, source):
+        self.activate = activate
+        self.source = source
+
+    @staticmethod
+    def create(genome, config):
+        # Genomes with the same genes (in the same order, which decides the order links are added up in) share one function
+        key = genome_key(genome, tuple(genome.connections))
+        compiled = CACHE.get(key)
+        if compiled is not None:
+            CACHE.move_to_end(key)
+            return compiled
+
+        source, namespace = generate(neat.nn.FeedForwardNetwork.create(genome, config))
+        exec(compile(source, "<genome {0}>".format(genome.key), "exec"), namespace)
+        compiled = CompiledNetwork(namespace["activate"], source)
+        CACHE[key] = compiled
+        if len(CACHE) > CACHE_SIZE:
+            CACHE.popitem(last=False)
+        return compiled
@@ -0,0 +1,42 @@
+import random
+import numpy as np
+
+
+class Course(object):
+    # A pipe course: the height of every pipe an episode will spawn, generated ahead of time from a seed
+    # The same seed always gives the same course, so runs can be reproduced, and every worker process
+    # can be handed the same course without any locking. Heights are kept in a compact uint16 array.
+    MIN_HEIGHT = 50
+    MAX_HEIGHT = 450
+    LENGTH = 1024
+
+    def __init__(self, seed, length=LENGTH):
+        self.seed = seed
+        self.heights = self._generate(length)
+
+    def _generate(self, length):
+        # Pipe heights are drawn the same way Pipe.set_height() draws them, just from a seeded generator
+        rng = random.Random(self.seed)
+        return np.array([rng.randrange(self.MIN_HEIGHT, self.MAX_HEIGHT) for _ in range(length)], dtype=np.uint16)
+
+    def __len__(self):
+        return len(self.heights)
+
+    def __getitem__(self, i):
+        # Height of the i-th pipe of the course
+        # Very long episodes extend the course, the pipes already generated stay the same
+        if i >= len(self.heights):
+            self.heights = self._generate(max(i + 1, 2 * len(self.heights)))
+        return int(self.heights[i])
+
+    @staticmethod
+    def for_generation(seed, generation, fresh=False):
+        # The course a generation flies through
+        # seed: base seed of the run, or None for an unseeded run (a new random course every generation)
+        # fresh: give every generation its own course, derived from the seed and the generation number,
+        #        instead of using the same course for all of them
+        if seed is None:
+            return Course(random.randrange(2**32))
+        if fresh:
+            return Course((seed << 32) | generation)
+        return Course(seed)
@@ -0,0 +1,90 @@
+import numpy as np
+
+# The game side of the batched NEAT runner (see batch_runner.py)
+# A game only has to describe one frame for all of its agents at once. Everything else, from evaluating the networks
+# of a whole generation together to worker processes, schedules, the fitness cache, the frame limiter, the profiler
+# and the spectator, is done by the runner, so every game gets the fast evaluation path without copying the loop.
+#
+# A frame is split at the moment the agents decide what to do:
+    # update(): everything that happens before the agents decide (gravity, in Flappy Bird)
+    # observe(agents): the network inputs of the given agents, one row each
+    # act(agents, outputs): carry out the decisions (one row of network outputs per agent) and everything that follows
+        ## from them, collisions and scoring included
+# update() and act() return the rewards of the frame as a list of (agents, amount) pairs, where agents is an array of
+# agent indices or a boolean mask. The runner adds them to the fitness of the agents in that order, so a game
+# decides exactly how its rewards add up.
+#
+# An episode ends once no agent is alive any more, or once the score goes past the limit the runner was given.
+# Agents are numbered from 0, agent i plays for genome i.
+#
+# Training runs (batch_runner.Runner) also ask the game class for the scenario of every generation, the window rendered
+# runs draw in, and the spectator that shows the snapshots of the game live.
+
+
+class Environment(object):
+    # Base class of the games the runner plays
+    # Games are created as Game(scenario, track_clearance, record) for every episode, in the process that simulates it,
+    # so the class and the scenario have to be picklable to be sent to worker processes.
+        # scenario: what the episode is played on (a pipe course in Flappy Bird). Its 'seed' names it in the fitness cache
+        # track_clearance: also keep track of how close every agent came to losing, as used by the schedules
+        # record: also keep what every agent did, for games with replays. Games without them can ignore it
+    # After reset(), a game has:
+        # alive: boolean array, the agents still playing. The runner switches agents off in it to drop them
+        # score: progress of the episode as a whole (pipes passed in Flappy Bird)
+        # clearance: for every agent, the closest it came to losing (larger is safer). Games without such a measure
+            ## can leave it at infinity, the schedules then only rank agents by fitness
+    # profiler: the PhaseTimer of the episode (see profiling.py) or None, set by the runner for games that time phases
+        ## of their own
+
+    def __init__(self, scenario, track_clearance=False, record=False):
+        self.scenario = scenario
+        self.track_clearance = track_clearance
+        self.record = record
+        self.profiler = None
+        self.alive = None
+        self.score = 0
+        self.clearance = None
+
+    def reset(self, size):
+        # Start an episode for 'size' agents
+        self.alive = np.ones(size, dtype=bool)
+        self.score = 0
+        self.clearance = np.full(size, np.inf)
+
+    def update(self):
+        # Advance the parts of the frame that do not depend on the agents' decisions, and return their rewards
+        return []
+
+    def observe(self, agents):
+        # Network inputs of the given agents, an array with one row per agent
+        raise NotImplementedError
+
+    def act(self, agents, outputs):
+        # Carry out the decisions of the given agents and finish the frame, return the rewards
+        raise NotImplementedError
+
+    def draw(self, shown, alive):
+        # Draw the current frame, with the agents in 'shown' on screen and the number of agents alive
+        raise NotImplementedError
+
+    def snapshot(self, shown):
+        # Copy of what is needed to draw the current frame with the agents in 'shown' on screen, for the spectator
+        raise NotImplementedError
+
+    @staticmethod
+    def scenario(seed, generation, fresh=False):
+        # The scenario a generation plays
+        # seed: base seed of the run, or None for an unseeded run (a new random scenario every generation)
+        # fresh: give every generation its own scenario, derived from the seed and the generation number,
+        #        instead of using the same scenario for all of them
+        raise NotImplementedError
+
+    @staticmethod
+    def open_window():
+        # Create the window that rendered generations are drawn in
+        raise NotImplementedError
+
+    @staticmethod
+    def spectator(top):
+        # The batch_runner.Spectator that draws this game's snapshots, showing the 'top' fittest agents alive (all if None)
+        raise NotImplementedError
@@ -0,0 +1,55 @@
+import hashlib
+from collections import OrderedDict
+
+
+def genome_key(genome, *context):
+    # Stable hash of everything that decides how a genome plays: its node genes, its connection genes,
+    # and whatever else the episode depends on (the course seed, for example), given as context
+    # Two genomes with the same structure and weights get the same key, whatever their genome ids are
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr(context).encode())
+    for key in sorted(genome.nodes):
+        ng = genome.nodes[key]
+        h.update(repr((key, ng.bias, ng.response, ng.activation, ng.aggregation)).encode())
+    for key in sorted(genome.connections):
+        cg = genome.connections[key]
+        h.update(repr((key, cg.weight, cg.enabled)).encode())
+    return h.digest()
+
+
+class FitnessCache(object):
+    # Remembers the fitness of genomes that were already evaluated on a deterministic course
+    # Elites are carried into the next generation unchanged, so on a fixed course they would score
+    # exactly the same again. Looking them up here saves simulating them a second time.
+    # The cache holds at most 'maxsize' entries and forgets the least recently used ones first.
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+
+        # Lookups since the last call to reset_counts()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        # Returns the cached fitness, or None if the key is unknown
+        fitness = self.entries.get(key)
+        if fitness is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return fitness
+
+    def put(self, key, fitness):
+        self.entries[key] = fitness
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def reset_counts(self):
+        self.hits = 0
+        self.misses = 0
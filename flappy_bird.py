@@ -1,28 +1,48 @@
-import pygame, random, os, neat
+import pygame, random, os, argparse, functools, neat
+import numpy as np
+from collision import SpanTable, overlap
+from course import Course
+from render import RotationCache, Label, Renderer
+from assets import image, font, lazy
+import checkpoint
+import replay
+import islands as island_model
+import batch_runner
+from environment import Environment
 
 # Initialization
-pygame.font.init()  
 FLOOR = 730
-STAT_FONT = pygame.font.Font("assets/font.otf", 50)
 DRAW_LINES = False
 
 WIN_WIDTH = 600
 WIN_HEIGHT = 800
-WIN = pygame.display.set_mode((WIN_WIDTH, WIN_HEIGHT))
-pygame.display.set_caption("Flappy Bird")
-
-pipe_img = pygame.transform.scale2x(pygame.image.load(os.path.join("assets","pipe.png")).convert_alpha())
-bg_img = pygame.transform.scale(pygame.image.load(os.path.join("assets","bg.png")).convert_alpha(), (600, 900))
-bird_images = [pygame.transform.scale2x(pygame.image.load(os.path.join("assets","bird" + str(x) + ".png"))) for x in range(1,4)]
-base_img = pygame.transform.scale2x(pygame.image.load(os.path.join("assets","base.png")).convert_alpha())
-
-gen = 0
+# The window is only created when a rendered run starts (see open_window)
+# Importing this module or training headless never needs a display
+WIN = None
+
+# Drawing state that is kept from frame to frame (see render.py)
+    # ROTATIONS: rotated bird images, shared by every bird
+    # LABELS: the text shown on screen, only rendered again when it changes
+    # RENDERER: only sends the parts of the window that changed to the display, created by open_window()
+ROTATIONS = RotationCache()
+LABELS = {}
+RENDERER = None
+
+# Images and fonts are only loaded when first used (see assets.py), so importing this module is cheap
+# The sprites are class attributes of Base, Pipe and Bird, and open_window() swaps in display-optimized copies
+# once the window exists. The background is only needed for drawing.
+def background():
+    return image("bg.png", size=(600, 900))
+
+# Training is run by RUNNER, the batched runner of this game (see batch_runner.py), created below the FlappyBird class
+# It holds the rendering and evaluation options of the run, the generation counter and the course flown last
 
 class Base:
     # The floor of the screen is defined here
     VEL = 5
-    WIDTH = base_img.get_width()
-    IMG = base_img
+    IMG = lazy(lambda: image("base.png", 2))
+    WIDTH = lazy(lambda: Base.IMG.get_width())
+    __slots__ = ("y", "x1", "x2")
 
     def __init__(self, y):
         # Initialize the floor object - x and y are the coordinates on screen
@@ -43,16 +63,25 @@ class Base:
     def draw(self, win):
         # Drawing the sliding floor
         ## Two instances of the base image is rendered, and one slides after the other so that the screen always has a floor instance
-        win.blit(self.IMG, (self.x1, self.y))
-        win.blit(self.IMG, (self.x2, self.y))
+        return [win.blit(self.IMG, (self.x1, self.y)), win.blit(self.IMG, (self.x2, self.y))]
 
 class Pipe():
     # The pipe objects are defined here
     GAP = 200
     VEL = 5
 
-    def __init__(self, x):
+    # The images and collision masks are shared by every pipe
+    # Flip the pipe image vertically to get the top pipe
+    PIPE_TOP = lazy(lambda: pygame.transform.flip(image("pipe.png", 2), False, True))
+    PIPE_BOTTOM = lazy(lambda: image("pipe.png", 2))
+    TOP_MASK = lazy(lambda: pygame.mask.from_surface(pygame.transform.flip(image("pipe.png", 2), False, True)))
+    BOTTOM_MASK = lazy(lambda: pygame.mask.from_surface(image("pipe.png", 2)))
+    # Pipes only hold their position, with __slots__ instead of a __dict__ per pipe
+    __slots__ = ("x", "height", "top", "bottom", "passed")
+
+    def __init__(self, x, height=None):
         # Initialize the pipe object - x and y are the coordinates on screen
+        # height: height of the top pipe, usually taken from a Course. A random height is used if it is None
         self.x = x
         self.height = 0
 
@@ -60,17 +89,15 @@ class Pipe():
         self.top = 0
         self.bottom = 0
 
-        # Flip the pipe image vertically to get the bottom pipe
-        self.PIPE_TOP = pygame.transform.flip(pipe_img, False, True)
-        self.PIPE_BOTTOM = pipe_img
-
         self.passed = False
-        self.set_height()
+        self.set_height(height)
 
-    def set_height(self):
-        # The height of the top pipe will be set randomly 
+    def set_height(self, height=None):
+        # The height of the top pipe will be set randomly, unless it is given
         # Bottom pipe height will be calculated according to gap value defined above, and top height
-        self.height = random.randrange(50, 450)
+        if height is None:
+            height = random.randrange(Course.MIN_HEIGHT, Course.MAX_HEIGHT)
+        self.height = height
         self.top = self.height - self.PIPE_TOP.get_height()
         self.bottom = self.height + self.GAP
 
@@ -79,10 +106,8 @@ class Pipe():
         self.x -= self.VEL
 
     def draw(self, win):
-        # draw top
-        win.blit(self.PIPE_TOP, (self.x, self.top))
-        # draw bottom
-        win.blit(self.PIPE_BOTTOM, (self.x, self.bottom))
+        # draw top and bottom, returns the rectangles drawn to
+        return [win.blit(self.PIPE_TOP, (self.x, self.top)), win.blit(self.PIPE_BOTTOM, (self.x, self.bottom))]
 
 
     def collide(self, bird, win):
@@ -91,29 +116,51 @@ class Pipe():
         # They can be thought of as an invisible 'wrapper' around the pixel groups of interest
         # In our case, desired pixel groups are those correspondiing to the bird objects and pipe objects
 
+        # Cheap bounding box test first, most of the time the bird is nowhere near the pipe
+        bird_rect = bird.img.get_rect(topleft=(bird.x, round(bird.y)))
+        top_rect = self.PIPE_TOP.get_rect(topleft=(self.x, self.top))
+        bottom_rect = self.PIPE_BOTTOM.get_rect(topleft=(self.x, self.bottom))
+        if not bird_rect.colliderect(top_rect) and not bird_rect.colliderect(bottom_rect):
+            return False
+
         bird_mask = bird.get_mask()
-        top_mask = pygame.mask.from_surface(self.PIPE_TOP)
-        bottom_mask = pygame.mask.from_surface(self.PIPE_BOTTOM)
         top_offset = (self.x - bird.x, self.top - round(bird.y))
         bottom_offset = (self.x - bird.x, self.bottom - round(bird.y))
 
         # A pygame mask uses 1 bit per-pixel to store which parts collide, calculating overlap automatically
-        b_point = bird_mask.overlap(bottom_mask, bottom_offset)
-        t_point = bird_mask.overlap(top_mask,top_offset)
+        b_point = bird_mask.overlap(self.BOTTOM_MASK, bottom_offset)
+        t_point = bird_mask.overlap(self.TOP_MASK,top_offset)
 
         if b_point or t_point:
             return True
 
         return False
 
+    def collide_all(self, birds):
+        # Same check as collide(), for every living bird of a BirdPopulation at once
+        # Uses the row by row span tables of the sprites instead of masks (see collision.py)
+        # Returns a boolean array, True for the birds that hit this pipe
+        top, bottom, bird_spans = collision_spans()
+        alive = np.flatnonzero(birds.alive)
+        ys = np.rint(birds.y[alive])
+        frames = birds.frame[alive]
+
+        hit = np.zeros(len(birds), dtype=bool)
+        hit[alive] = (overlap(bird_spans, frames, birds.x, ys, top, self.x, self.top) |
+                      overlap(bird_spans, frames, birds.x, ys, bottom, self.x, self.bottom))
+        return hit
+
 
 
 class Bird:
     # The bird objects are defined here
     MAX_ROTATION = 25
-    IMGS = bird_images
+    IMGS = lazy(lambda: [image("bird" + str(x) + ".png", 2) for x in range(1,4)])
+    MASKS = lazy(lambda: [pygame.mask.from_surface(img) for img in Bird.IMGS])
     ROT_VEL = 20
     ANIMATION_TIME = 5
+    # Single birds (replays, collision checks) keep their state in __slots__, whole generations use BirdPopulation
+    __slots__ = ("x", "y", "tilt", "tick_count", "vel", "height", "img_count", "img")
 
     def __init__(self, x, y):
         # Initialize the bird objects
@@ -167,223 +214,709 @@ class Bird:
 
     def draw(self, win):
         # Draw the bird object on the screen
-        self.img_count += 1
-
         # The bird's wings will be animated by constantly cycling through the three bird images stored in 'assets' folder
-        if self.img_count <= self.ANIMATION_TIME:
-            self.img = self.IMGS[0]
-        elif self.img_count <= self.ANIMATION_TIME*2:
-            self.img = self.IMGS[1]
-        elif self.img_count <= self.ANIMATION_TIME*3:
-            self.img = self.IMGS[2]
-        elif self.img_count <= self.ANIMATION_TIME*4:
-            self.img = self.IMGS[1]
-        elif self.img_count == self.ANIMATION_TIME*4 + 1:
-            self.img = self.IMGS[0]
-            self.img_count = 0
-
-        # The bird will not flap its wings if it is falling downwards
-        if self.tilt <= -80:
-            self.img = self.IMGS[1]
-            self.img_count = self.ANIMATION_TIME*2
-
+        self.img_count, frame = flap_frame(self.img_count, self.IMGS.index(self.img), self.tilt)
+        self.img = self.IMGS[frame]
 
         # Apply the angular tilt of the bird
         # Not important for our purposes - just adds to the aesthetics
-        blitRotateCenter(win, self.img, (self.x, self.y), self.tilt)
+        return blitRotateCenter(win, self.img, (self.x, self.y), self.tilt)
 
     def get_mask(self):
         # Obtains and returns the mask for the current object
-        return pygame.mask.from_surface(self.img)
+        # The masks of the three images are built once and shared by every bird
+        return self.MASKS[self.IMGS.index(self.img)]
+
+@functools.lru_cache(maxsize=None)
+def collision_spans():
+    # Row by row span tables of the top pipe, the bottom pipe and the three bird images, for Pipe.collide_all()
+    # Built from the shared masks the first time they are needed
+    return (SpanTable.from_mask(Pipe.TOP_MASK), SpanTable.from_mask(Pipe.BOTTOM_MASK),
+            SpanTable.stack([SpanTable.from_mask(mask) for mask in Bird.MASKS]))
+
+def flap_frame(img_count, frame, tilt):
+    # Advance the wing animation of a bird by one drawn frame
+    # Takes the animation counter, the index of the image currently shown and the tilt of the bird
+    # Returns the new animation counter and the index of the image to show next
+    img_count += 1
+
+    if img_count <= Bird.ANIMATION_TIME:
+        frame = 0
+    elif img_count <= Bird.ANIMATION_TIME*2:
+        frame = 1
+    elif img_count <= Bird.ANIMATION_TIME*3:
+        frame = 2
+    elif img_count <= Bird.ANIMATION_TIME*4:
+        frame = 1
+    elif img_count == Bird.ANIMATION_TIME*4 + 1:
+        frame = 0
+        img_count = 0
+
+    # The bird will not flap its wings if it is falling downwards
+    if tilt <= -80:
+        frame = 1
+        img_count = Bird.ANIMATION_TIME*2
+
+    return img_count, frame
+
+class BirdPopulation:
+    # A whole generation of birds, stored as NumPy arrays with one entry per bird instead of one Bird object each
+    # All birds are moved together in one vectorized step per frame, following exactly the same rules as Bird.move
+    # Dead birds are switched off in the 'alive' mask instead of being removed from lists, so bird i always belongs to genome i
+    MAX_ROTATION = Bird.MAX_ROTATION
+    IMGS = lazy(lambda: Bird.IMGS)
+    ROT_VEL = Bird.ROT_VEL
+
+    def __init__(self, size, x, y):
+        # Every bird starts from the same spot, and all of them share the same horizontal position
+        self.x = x
+        self.y = np.full(size, y, dtype=np.float64)
+        self.tilt = np.zeros(size)
+        self.tick_count = np.zeros(size, dtype=np.int64)
+        self.vel = np.zeros(size)
+        self.height = self.y.copy()
+        self.alive = np.ones(size, dtype=bool)
+
+        # Animation state, only advanced when a bird is drawn (same as Bird.img_count and Bird.img)
+        self.img_count = np.zeros(size, dtype=np.int64)
+        self.frame = np.zeros(size, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.y)
+
+    def __getitem__(self, i):
+        # Bird-like view of a single bird, for drawing and mask based collision checks
+        return BirdView(self, i)
+
+    def count(self):
+        # Number of birds still alive
+        return int(np.count_nonzero(self.alive))
+
+    def jump(self, mask):
+        # Same as Bird.jump, for every bird selected by the boolean mask
+        self.vel[mask] = -10.5
+        self.tick_count[mask] = 0
+        self.height[mask] = self.y[mask]
 
-def blitRotateCenter(surf, image, topleft, angle):
-    # Rotating a bird instance according to the definitions above
-    rotated_image = pygame.transform.rotate(image, angle)
-    new_rect = rotated_image.get_rect(center = image.get_rect(topleft = topleft).center)
+    def move(self):
+        # Same as Bird.move, applied to every living bird at once
+        # Dead birds keep their last position, and only the living ones are worked on, which are few late in an episode
+        alive = np.flatnonzero(self.alive)
+        tick_count = self.tick_count[alive] + 1
+        self.tick_count[alive] = tick_count
+
+        # s = ut + 0.5 at^2, written in the same order as Bird.move so results match it bit for bit
+        displacement = self.vel[alive]*(tick_count) + 0.5*(3)*(tick_count)**2
+
+        # Terminal velocity, plus the extra push when going up
+        displacement = np.where(displacement >= 16, 16.0, displacement)
+        displacement = np.where(displacement < 0, displacement - 2, displacement)
+
+        y = self.y[alive] + displacement
+        self.y[alive] = y
+
+        # Tilt up when rising (or just after a jump), tilt down when falling
+        tilt = self.tilt[alive]
+        tilt_up = (displacement < 0) | (y < self.height[alive] + 50)
+        self.tilt[alive] = np.where(tilt_up,
+                                    np.where(tilt < self.MAX_ROTATION, self.MAX_ROTATION, tilt),
+                                    np.where(tilt > -90, tilt - self.ROT_VEL, tilt))
+
+    def out_of_bounds(self):
+        # Birds that hit the floor or flew off the top of the screen
+        return (self.y + self.IMGS[0].get_height() - 10 >= FLOOR) | (self.y < -50)
+
+    def draw(self, win, i):
+        # Same as Bird.draw, for bird i
+        self.img_count[i], self.frame[i] = flap_frame(self.img_count[i], self.frame[i], self.tilt[i])
+        return blitRotateCenter(win, self.IMGS[self.frame[i]], (self.x, self.y[i]), self.tilt[i])
+
+    def animate(self, indices):
+        # Same as flap_frame, for every bird in indices at once
+        t = Bird.ANIMATION_TIME
+        img_count = self.img_count[indices] + 1
+        frame = np.select([img_count <= t, img_count <= t*2, img_count <= t*3, img_count <= t*4, img_count == t*4 + 1],
+                          [0, 1, 2, 1, 0], self.frame[indices])
+        img_count[img_count == t*4 + 1] = 0
+
+        # The bird will not flap its wings if it is falling downwards
+        falling = self.tilt[indices] <= -80
+        frame[falling] = 1
+        img_count[falling] = t*2
+
+        self.img_count[indices] = img_count
+        self.frame[indices] = frame
+
+    def draw_all(self, win, indices):
+        # Same as calling draw() for every bird in indices, returns the rectangle around all of them
+        # Birds that look exactly the same (same image, tilt and height) are only drawn once, which early in
+        # a generation is most of them. The sprites have no partial transparency, so drawing only the last
+        # of every group of identical birds, in the original order, gives the same picture.
+        indices = np.asarray(indices)
+        if len(indices) == 0:
+            return None
+        self.animate(indices)
+        looks = np.stack([self.frame[indices], self.tilt[indices], self.y[indices]], axis=1)
+        _, last = np.unique(looks[::-1], axis=0, return_index=True)
+        rects = [blitRotateCenter(win, self.IMGS[int(frame)], (self.x, y), tilt)
+                 for frame, tilt, y in looks[np.sort(len(looks) - 1 - last)].tolist()]
+        return rects[0].unionall(rects[1:])
+
+    def group(self, indices):
+        # The birds in indices, to be drawn together by draw_window()
+        return BirdGroup(self, indices)
+
+    def get_mask(self, i):
+        # Same as Bird.get_mask, for bird i
+        return Bird.MASKS[self.frame[i]]
+
+class BirdView:
+    # Looks like a Bird object, but reads and writes one entry of a BirdPopulation
+    # Lets draw_window() and Pipe.collide() work on single birds of a population
+    __slots__ = ("population", "index")
+
+    def __init__(self, population, index):
+        self.population = population
+        self.index = index
+
+    @property
+    def x(self):
+        return self.population.x
+
+    @property
+    def y(self):
+        return float(self.population.y[self.index])
+
+    @property
+    def tilt(self):
+        return float(self.population.tilt[self.index])
+
+    @property
+    def img(self):
+        return self.population.IMGS[self.population.frame[self.index]]
 
-    surf.blit(rotated_image, new_rect.topleft)
+    def draw(self, win):
+        return self.population.draw(win, self.index)
 
-def draw_window(win, birds, pipes, base, score, gen, pipe_ind):
+    def get_mask(self):
+        return self.population.get_mask(self.index)
+
+class BirdGroup:
+    # Several birds of a BirdPopulation, drawn by draw_window() in one go instead of one by one
+    def __init__(self, population, indices):
+        self.population = population
+        self.indices = indices
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __iter__(self):
+        return (self.population[i] for i in self.indices)
+
+    def draw(self, win):
+        return self.population.draw_all(win, self.indices)
+
+def blitRotateCenter(surf, image, topleft, angle):
+    # Rotating a bird instance according to the definitions above
+    # The rotated images are cached, and the rectangle drawn to is returned
+    return ROTATIONS.blit(surf, image, topleft, angle)
+
+def open_window():
+    # Create the simulation window (or reuse the open one) and convert the images to the display pixel format
+    # Converted surfaces blit much faster, but converting is only possible once a display exists
+    global WIN, RENDERER
+    WIN = pygame.display.set_mode((WIN_WIDTH, WIN_HEIGHT))
+    pygame.display.set_caption("Flappy Bird")
+
+    pipe_img = image("pipe.png", 2).convert_alpha()
+    Base.IMG = image("base.png", 2).convert_alpha()
+    Pipe.PIPE_TOP = pygame.transform.flip(pipe_img, False, True)
+    Pipe.PIPE_BOTTOM = pipe_img
+    RENDERER = Renderer(WIN, background().convert_alpha())
+    return WIN
+
+def draw_window(win, birds, pipes, base, score, gen, pipe_ind, alive=None):
     
     # Draw the window for our simualtion
     # List of parameters:
         # win: pygame window surface
-        # bird: a Bird object
+        # birds: list of Bird objects (or BirdViews), or a BirdGroup
         # pipes: List of pipes
         # score: score of the game -> integer value
         # gen: current generation
         # pipe_ind: index of closest pipe
+        # alive: number of birds alive, if only some of them are drawn (defaults to len(birds))
 
+    # Only the parts of the window that changed since the last frame are drawn and updated
+    # A window other than the one from open_window() is simply redrawn completely
     if gen == 0:
         gen = 1
-    win.blit(bg_img, (0,0))
+    renderer = RENDERER if RENDERER is not None and RENDERER.win is win else Renderer(win, background())
+    renderer.begin()
 
     for pipe in pipes:
-        pipe.draw(win)
+        for rect in pipe.draw(win):
+            renderer.mark(rect)
 
-    base.draw(win)
-    for bird in birds:
-        # Draw lines from bird to pipe
-        if DRAW_LINES:
+    for rect in base.draw(win):
+        renderer.mark(rect)
+
+    # Draw lines from bird to pipe
+    if DRAW_LINES:
+        for bird in birds:
             try:
-                pygame.draw.line(win, (255,0,0), (bird.x+bird.img.get_width()/2, bird.y + bird.img.get_height()/2), (pipes[pipe_ind].x + pipes[pipe_ind].PIPE_TOP.get_width()/2, pipes[pipe_ind].height), 5)
-                pygame.draw.line(win, (255,0,0), (bird.x+bird.img.get_width()/2, bird.y + bird.img.get_height()/2), (pipes[pipe_ind].x + pipes[pipe_ind].PIPE_BOTTOM.get_width()/2, pipes[pipe_ind].bottom), 5)
+                renderer.mark(pygame.draw.line(win, (255,0,0), (bird.x+bird.img.get_width()/2, bird.y + bird.img.get_height()/2), (pipes[pipe_ind].x + pipes[pipe_ind].PIPE_TOP.get_width()/2, pipes[pipe_ind].height), 5))
+                renderer.mark(pygame.draw.line(win, (255,0,0), (bird.x+bird.img.get_width()/2, bird.y + bird.img.get_height()/2), (pipes[pipe_ind].x + pipes[pipe_ind].PIPE_BOTTOM.get_width()/2, pipes[pipe_ind].bottom), 5))
             except:
                 pass
-        # Draw bird
-        bird.draw(win)
+
+    # Draw birds
+    if isinstance(birds, BirdGroup):
+        rect = birds.draw(win)
+        if rect is not None:
+            renderer.mark(rect)
+    else:
+        for bird in birds:
+            renderer.mark(bird.draw(win))
 
     # Draw score on screen
-    score_label = STAT_FONT.render("Score: " + str(score),1,(255,255,255))
-    win.blit(score_label, (WIN_WIDTH - score_label.get_width() - 15, 10))
+    score_label = label("score").render("Score: " + str(score))
+    renderer.blit(score_label, (WIN_WIDTH - score_label.get_width() - 15, 10))
 
     # Draw 'generation number' value on screen
-    score_label = STAT_FONT.render("Gens: " + str(gen-1),1,(255,255,255))
-    win.blit(score_label, (10, 10))
+    renderer.blit(label("gen").render("Gens: " + str(gen-1)), (10, 10))
 
     # Draw 'number of birds alive' value on screen
-    score_label = STAT_FONT.render("Alive: " + str(len(birds)),1,(255,255,255))
-    win.blit(score_label, (10, 50))
+    if alive is None:
+        alive = len(birds)
+    renderer.blit(label("alive").render("Alive: " + str(alive)), (10, 50))
+
+    renderer.end()
+
+def label(name):
+    # Cached text label for the given line of the on-screen stats
+    if name not in LABELS:
+        LABELS[name] = Label(font(50), (255,255,255))
+    return LABELS[name]
+
+
+
+class ReplayRecorder(neat.reporting.BaseReporter):
+    # Records the replay of every generation's champion (see replay.py), for runs with RUNNER.run(record=True)
+    # The champion's jumps are taken from the episode its generation was flown in, since a bird's flight only depends
+    # on its genome and the course. Champions that were not flown in this process (taken from the fitness cache, or
+    # flown by worker processes) fly once more on their own, unless they were the champion of the last generation too.
+    # log: file every champion's replay is appended to, or None
+    # keep_best: keep the replay of the best genome so far in 'best', as (fitness, Replay)
+
+    def __init__(self, log=None, keep_best=False):
+        self.log = log
+        self.keep_best = keep_best
+        self.best = None
+        self.last = None
+
+    def post_evaluate(self, config, population, species, best_genome):
+        # The champion is the first genome with the highest fitness, as picked by NEAT
+        generation = max(RUNNER.generation - 1, 0)
+        episode = RUNNER.episode
+        flown = [i for i, genome in enumerate(episode.ge) if genome is best_genome] if episode is not None else []
+        last = self.last
+        if flown:
+            recorded = episode.env.replay(flown[0], best_genome.key, generation, float(episode.fitness[flown[0]]))
+        elif last is not None and (last.genome_id, last.course_seed, last.fitness) == \
+                (best_genome.key, RUNNER.scenario.seed, best_genome.fitness):
+            recorded = replay.Replay(last.course_seed, last.genome_id, generation, last.frames, last.fitness, last.jumps)
+        else:
+            recorded = record_replay(best_genome, config, RUNNER.scenario, RUNNER.schedule.max_score, generation)
+        self.last = recorded
+        if self.log is not None:
+            replay.save(self.log, [recorded], append=True)
+        if self.keep_best and (self.best is None or best_genome.fitness > self.best[0]):
+            self.best = (best_genome.fitness, recorded)
+
+class FlappyBird(Environment):
+    # Flappy Bird as a game for the batched runner (see environment.py and batch_runner.py)
+    # Every agent is a bird, and every episode flies through the pipes of one course
+    # course: the Course the pipe heights are taken from
+    # track_clearance: keep track of the closest each bird came to a pipe
+    # record: keep which birds jumped in every frame, for replays
+
+    def __init__(self, course, track_clearance=False, record=False):
+        Environment.__init__(self, course, track_clearance, record)
+        self.course = course
+
+    def reset(self, size):
+        Environment.reset(self, size)
+        self.birds = BirdPopulation(size, 230, 350)
+        # Birds that crash are switched off in the population's 'alive' mask, which is the one the runner sees
+        self.alive = self.birds.alive
+
+        self.base = Base(FLOOR)
+        self.pipes = [Pipe(700, self.course[0])]
+        self.spawned = 1
+        self.pipe_ind = 0
+
+        # Frames simulated so far, and (only kept when recording replays) which birds jumped in each of them and
+        # how many frames every bird flew
+        self.frames = 0
+        self.jump_log = [] if self.record else None
+        self.flown = np.zeros(size, dtype=int) if self.record else None
+        self.drawn = False
+
+    def update(self):
+        birds, pipes = self.birds, self.pipes
 
-    pygame.display.update()
+        # Determine if we'll use the first or second pipe on the screen for neural network input
+        self.pipe_ind = 0
+        if len(pipes) > 1 and birds.x > pipes[0].x + pipes[0].PIPE_TOP.get_width():  
+            self.pipe_ind = 1                                                                 
 
+        # Each bird is given a fitness of 0.1 for each frame it stays alive. We're generating 30/60/etc frames per second, so survival accrues a lot of reward 
+        alive = np.flatnonzero(birds.alive)
+        birds.move()
+        return [(alive, 0.1)]
+
+    def observe(self, birds):
+        # Neural network reserves a number of inputs, and produces an ouput
+            # Inputs: location of bird, location of top pipe, location of bottom pipe
+            # Outputs: Depends on activation function defined in config file. Using tanh function will result in a number between -1 and 1
+        pipe = self.pipes[self.pipe_ind]
+        y = self.birds.y[birds]
+        return np.column_stack((y, np.abs(y - pipe.height), np.abs(y - pipe.bottom)))
+
+    def act(self, agents, outputs):
+        birds, pipes = self.birds, self.pipes
+        prof = self.profiler
+        rewards = []
+
+        # Output value > 0.5 will result in a jump command for the bird
+        jump = np.zeros(len(birds), dtype=bool)
+        jump[agents] = outputs[:, 0] > 0.5
+        birds.jump(jump)
+        if self.jump_log is not None:
+            self.jump_log.append(np.flatnonzero(jump))
+            self.flown[agents] += 1
+        self.frames += 1
+
+        self.base.move()
 
+        rem = []
+        add_pipe = False
+        for pipe in pipes:
+            pipe.move()
+            # Check for pipe-bird collision, colliding (bad) birds are taken out of the generation
+            if prof is not None:
+                prof.lap("physics")
+            hit = pipe.collide_all(birds)
+            if prof is not None:
+                prof.lap("collide")
+            rewards.append((hit, -1))
+            birds.alive[hit] = False
+
+            if self.track_clearance and pipe.x < birds.x + Bird.IMGS[0].get_width() and pipe.x + pipe.PIPE_TOP.get_width() > birds.x:
+                gap = np.minimum(birds.y - pipe.height, pipe.bottom - (birds.y + Bird.IMGS[0].get_height()))
+                self.clearance = np.where(birds.alive, np.minimum(self.clearance, gap), self.clearance)
 
-def eval_genomes(genomes, config):
-    # The simulation will functionally begin from this point
-    # A generation of birds will be created and neural networks attached to each bird object
-    # Fitness will be calculated based on distance travelled without collision
+            if pipe.x + pipe.PIPE_TOP.get_width() < 0:
+                rem.append(pipe)
 
-    global WIN, gen
-    win = WIN
-    gen += 1
+            if not pipe.passed and pipe.x < birds.x:
+                pipe.passed = True
+                add_pipe = True
 
-    # Three lists created
-        # birds[] holds all the bird objects that are part of a generation
-        # ge[] holds all the genomes associated to each birds (genome is a collection of genes)
-            ## In NEAT-python, a population of individual genomes is maintained. 
-            ## Each genome contains 1) Node genes 2) Connection genes
-            ## The purpose is to identify useful genes (specific combinations of nodes and connections) over time
-        # nets[] contains all the whole neural networks that each corresponding bird object uses to decide its move
+        if add_pipe:
+            self.score += 1
+            # Giving more reward for each successful pass through a pipe
+            rewards.append((birds.alive.copy(), 0.5))
+            pipes.append(Pipe(WIN_WIDTH, self.course[self.spawned]))
+            self.spawned += 1
 
-    nets = []
-    birds = []
-    ge = []
+        for r in rem:
+            pipes.remove(r)
 
-    for genome_id, genome in genomes:
-        genome.fitness = 0  # start with fitness level of 0
-        net = neat.nn.FeedForwardNetwork.create(genome, config)
-        nets.append(net)
-        birds.append(Bird(230,350))
-        ge.append(genome)
+        # Birds hitting the floor or flying off the top of the screen are out as well, without a penalty
+        birds.alive &= ~birds.out_of_bounds()
+        return rewards
+
+    def draw(self, shown, alive):
+        # The whole window is drawn again at the start of a rendered episode
+        if not self.drawn and RENDERER is not None:
+            RENDERER.invalidate()
+        self.drawn = True
+        draw_window(WIN, self.birds.group(shown), self.pipes, self.base, self.score, RUNNER.generation, self.pipe_ind,
+                    alive=alive)
+
+    def snapshot(self, shown):
+        # Copy of what is needed to draw the current frame, showing the birds in 'shown'
+        return Snapshot(RUNNER.generation, len(self.birds), shown, self.birds.y[shown], self.birds.tilt[shown],
+                        [(pipe.x, pipe.height) for pipe in self.pipes], (self.base.x1, self.base.x2),
+                        self.score, self.pipe_ind, self.birds.count())
+
+    def replay(self, bird, genome_id, generation, fitness):
+        # Replay of the given bird's flight so far, the game must have been created with record=True
+        # It lasts as many frames as the bird flew, which is where a flight of the bird on its own would have ended
+        jump_log = self.jump_log
+        frames = np.repeat(np.arange(len(jump_log)), [len(jumped) for jumped in jump_log])
+        birds = np.concatenate(jump_log) if jump_log else np.zeros(0, dtype=int)
+        return replay.Replay(self.course.seed, genome_id, generation, int(self.flown[bird]), fitness,
+                             frames[birds == bird].tolist())
+
+    @staticmethod
+    def scenario(seed, generation, fresh=False):
+        # Every bird of a generation flies through the same pipe course, generated up front
+        return Course.for_generation(seed, generation, fresh)
+
+    @staticmethod
+    def open_window():
+        return open_window()
+
+    @staticmethod
+    def spectator(top):
+        return Spectator(top)
+
+RUNNER = batch_runner.Runner(FlappyBird)
+
+class Episode(batch_runner.Episode):
+    # One run of the game for a list of genomes, on a given course, played by the batched runner (see batch_runner.py)
+    # Set up with the profiler and spectator of this process, and drawn the way the rendering options ask for
+
+    def __init__(self, genomes, config, course, track_clearance=False, record=False):
+        batch_runner.Episode.__init__(self, FlappyBird(course, track_clearance, record), genomes, config,
+                                      RUNNER.profiler, RUNNER.spectator)
+
+    @property
+    def birds(self):
+        return self.env.birds
+
+    def run(self, max_score=20, render=False):
+        # Play until every bird has crashed or the score goes past max_score
+        # render: draw the episode in the window at 60 frames per second, either the whole flock or just the fittest bird
+        batch_runner.Episode.run(self, max_score, render, top=1 if RUNNER.render_best else None)
+
+    def snapshot(self, top=None):
+        # Copy of what is needed to draw the current frame, showing only the 'top' fittest birds alive (all of them if None)
+        return self.env.snapshot(self.fittest(top))
+
+    def replay(self, i):
+        # Replay of bird i's flight so far, the episode must have been created with record=True
+        return self.env.replay(i, self.ge[i].key, max(RUNNER.generation - 1, 0), float(self.fitness[i]))
+
+class Snapshot:
+    # One frame of an Episode, as published to the spectator
+    # indices: which birds of the episode are shown, y and tilt: their position and tilt
+    # pipes: (x, height) of every pipe, base: x positions of the two floor images, alive: number of birds alive
+    __slots__ = ("gen", "size", "indices", "y", "tilt", "pipes", "base", "score", "pipe_ind", "alive")
+
+    def __init__(self, gen, size, indices, y, tilt, pipes, base, score, pipe_ind, alive):
+        self.gen = gen
+        self.size = size
+        self.indices = indices
+        self.y = y
+        self.tilt = tilt
+        self.pipes = pipes
+        self.base = base
+        self.score = score
+        self.pipe_ind = pipe_ind
+        self.alive = alive
+
+class Spectator(batch_runner.Spectator):
+    # Live view of a training run that does not slow it down, drawing the Snapshots of the episodes (see batch_runner.py)
+    # top: only show this many of the fittest birds alive, or all of them if None
+
+    def __init__(self, top=1, capacity=8):
+        batch_runner.Spectator.__init__(self, top, capacity)
+        # Birds drawn by the spectator, only used for their wing animation, which advances with every drawn frame
+        self.flock = None
+        self.flock_key = None
+
+    def draw(self, snapshot):
+        key = (snapshot.gen, snapshot.size)
+        if key != self.flock_key:
+            self.flock = BirdPopulation(snapshot.size, 230, 350)
+            self.flock_key = key
+        self.flock.y[snapshot.indices] = snapshot.y
+        self.flock.tilt[snapshot.indices] = snapshot.tilt
+
+        pipes = [Pipe(x, height) for x, height in snapshot.pipes]
+        base = Base(FLOOR)
+        base.x1, base.x2 = snapshot.base
+        draw_window(WIN, self.flock.group(snapshot.indices), pipes, base, snapshot.score, snapshot.gen,
+                    snapshot.pipe_ind, alive=snapshot.alive)
+
+def record_replay(genome, config, course, max_score=20, generation=0):
+    # Fly a single genome on the course, and return the Replay of its flight in the given generation
+    # Flown apart from training, so it is neither profiled nor shown by the spectator
+    episode = batch_runner.Episode(FlappyBird(course, record=True), [genome], config)
+    episode.run(max_score)
+    return episode.env.replay(0, genome.key, generation, float(episode.fitness[0]))
+
+def play_replay(recorded, render=True):
+    # Play a Replay back with a Bird that jumps in the recorded frames, no network involved
+    # Follows the same steps as Episode.step(), so the bird flies exactly the recorded flight
+    # render: draw it in the window at 60 frames per second. Returns the score reached.
+    if render and WIN is None:
+        open_window()
+    if render and RENDERER is not None:
+        RENDERER.invalidate()
+    clock = pygame.time.Clock()
+    flown = Course(recorded.course_seed)
+    jumps = set(recorded.jumps)
 
+    bird = Bird(230, 350)
     base = Base(FLOOR)
-    pipes = [Pipe(700)]
+    pipes = [Pipe(700, flown[0])]
+    spawned = 1
     score = 0
 
-    clock = pygame.time.Clock()
-
-    run = True
-    while run and len(birds) > 0:
-        # Limit framerate to 30/60/120/etc
-        clock.tick(60)
-
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                run = False
-                pygame.quit()
-                quit()
-                break
+    for frame in range(recorded.frames):
+        if render:
+            clock.tick(60)
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    pygame.quit()
+                    quit()
 
-        # Determine if we'll use the first or second pipe on the screen for neural network input
         pipe_ind = 0
-        if len(birds) > 0:
-            if len(pipes) > 1 and birds[0].x > pipes[0].x + pipes[0].PIPE_TOP.get_width():  
-                pipe_ind = 1                                                                 
-
-        # Each bird is given a fitness of 0.1 for each frame it stays alive. We're generating 30/60/etc frames per second, so survival accrues a lot of reward 
-        for x, bird in enumerate(birds):  
-            ge[x].fitness += 0.1
-            bird.move()
-
-            # Neural network reserves a number of inputs, and produces an ouput
-                # Inputs: location of bird, location of top pipe, location of bottom pipe
-                # Outputs: Depends on activation function defined in config file. Using tanh function will result in a number between -1 and 1
-
-            output = nets[birds.index(bird)].activate((bird.y, abs(bird.y - pipes[pipe_ind].height), abs(bird.y - pipes[pipe_ind].bottom)))
-
-            # Output value > 0.5 will result in a jump command for the bird
-            if output[0] > 0.5: 
-                bird.jump()
+        if len(pipes) > 1 and bird.x > pipes[0].x + pipes[0].PIPE_TOP.get_width():
+            pipe_ind = 1
 
+        bird.move()
+        if frame in jumps:
+            bird.jump()
         base.move()
 
         rem = []
         add_pipe = False
         for pipe in pipes:
             pipe.move()
-            # Check for pipe-bird collision, remove colliding (bad) birds from the genome pool
-            for bird in birds:
-                if pipe.collide(bird, win):
-                    ge[birds.index(bird)].fitness -= 1
-                    nets.pop(birds.index(bird))
-                    ge.pop(birds.index(bird))
-                    birds.pop(birds.index(bird))
-
             if pipe.x + pipe.PIPE_TOP.get_width() < 0:
                 rem.append(pipe)
-
             if not pipe.passed and pipe.x < bird.x:
                 pipe.passed = True
                 add_pipe = True
 
         if add_pipe:
             score += 1
-            # Giving more reward for each successful pass through a pipe
-            for genome in ge:
-                genome.fitness += 0.5
-            pipes.append(Pipe(WIN_WIDTH))
-
+            pipes.append(Pipe(WIN_WIDTH, flown[spawned]))
+            spawned += 1
         for r in rem:
             pipes.remove(r)
 
-        for bird in birds:
-            if bird.y + bird.img.get_height() - 10 >= FLOOR or bird.y < -50:
-                nets.pop(birds.index(bird))
-                ge.pop(birds.index(bird))
-                birds.pop(birds.index(bird))
-
-        draw_window(WIN, birds, pipes, base, score, gen, pipe_ind)
-
-        # Stop simulation if score gets large enough
-        if score > 20:       
-           break
-
-
-def run(config_file):
-    # Initializes the NEAT algorithm before starting the simulation
-    config = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
-                         neat.DefaultSpeciesSet, neat.DefaultStagnation,
-                         config_file)
-
-    # Create the population.
-    p = neat.Population(config)
-
-    # Add a stdout reporter to show progress in the terminal.
-    p.add_reporter(neat.StdOutReporter(True))
-    stats = neat.StatisticsReporter()
-    p.add_reporter(stats)
-    #p.add_reporter(neat.Checkpointer(5))
-
-    # Begin simulation, run for up to 50 generations.
-    winner = p.run(eval_genomes, 50)
-    stats.save()
-    # show final stats
-    print('\nBest genome:\n{!s}'.format(winner))
+        if render:
+            draw_window(WIN, [bird], pipes, base, score, recorded.generation + 1, pipe_ind)
+    return score
+
+def simulate(genomes, config, course, render=False, max_score=20, details=False):
+    # Run one episode of the game with a list of genomes, and return the fitness of each of them
+    # course: the Course the pipe heights are taken from
+    # render: draw the episode in the window at 60 frames per second, instead of running it as fast as possible
+    # max_score: the episode stops once the score goes past this
+    # details: return a (fitness, survived, clearance) tuple for every genome instead, as used by the schedules in schedule.py
+    episode = Episode(genomes, config, course, track_clearance=details)
+    episode.run(max_score, render)
+    return episode.results(details)
+
+def run(config_file, headless=False, render_every=1, render_best=False, workers=1, seed=None, fresh_course=False,
+        cache_size=1024, max_score=20, halving_stages=1, profile=None, spectate=None, checkpoint_every=5, resume=None,
+        replay_log=None, export_replay=None, islands=1, migration_interval=5, migrants=2):
+    # Initializes the NEAT algorithm before starting the simulation, and runs it for up to 50 generations
+    # The training options are those of batch_runner.Runner.run(), where every generation flies a course:
+        ## fresh_course is its 'fresh' option, and the birds are its agents
+    # replay_log: file to append the replay of every generation's champion to
+    # export_replay: file to save the replay of the winner to, or None (or an empty name) for no replay
+    # islands: evolve this many populations at once, one process each, exchanging their best genomes (see islands.py)
+        ## migration_interval: generations between exchanges, migrants: genomes each island sends every time
+        ## Island runs are always headless, and do not use workers, the spectator, checkpoints or replays
+    if islands > 1:
+        winner = island_model.run_islands(config_file, islands, migration_interval, migrants, 50, dict(
+            seed=seed, fresh=fresh_course, cache_size=cache_size, max_score=max_score, halving_stages=halving_stages))
+        print('\nBest genome:\n{!s}'.format(winner))
+        return
+
+    recorder = None
+    if replay_log or export_replay:
+        recorder = ReplayRecorder(replay_log or None, keep_best=bool(export_replay))
+    winner = RUNNER.run(config_file, 50, headless=headless, render_every=render_every, render_best=render_best,
+                        workers=workers, seed=seed, fresh=fresh_course, cache_size=cache_size, max_score=max_score,
+                        halving_stages=halving_stages, profile=profile, spectate=spectate,
+                        checkpoint_every=checkpoint_every, resume=resume,
+                        reporters=[recorder] if recorder is not None else [], record=recorder is not None)
+
+    # The winner's replay was recorded in the generation it was the champion of, unless that was before resuming
+    if export_replay:
+        if recorder.best is not None and recorder.best[1].genome_id == winner.key:
+            recorded = recorder.best[1]
+        else:
+            recorded = record_replay(winner, RUNNER.config, RUNNER.scenario, RUNNER.schedule.max_score,
+                                     max(RUNNER.generation - 1, 0))
+        replay.save(export_replay, [recorded])
+        print("Saved the winner's replay to {0}: {1}".format(export_replay, recorded))
 
 # This will be executed only when flappy-bird.py is run individually
 # Avoids double execution of simulation when the run() command is called from the main.py file  
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Evolve NEAT networks that play Flappy Bird")
+    parser.add_argument("--headless", action="store_true",
+                        help="train without a window, no frame limiter and no drawing")
+    parser.add_argument("--render-every", type=int, default=1, metavar="N",
+                        help="only draw every Nth generation and fast-forward the others")
+    parser.add_argument("--render-best", action="store_true",
+                        help="only draw the fittest bird that is still alive")
+    parser.add_argument("--workers", type=int, default=1, metavar="N",
+                        help="split every generation over N processes (0 uses every core)")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="seed for a reproducible run, every generation flies the same course")
+    parser.add_argument("--fresh-course", action="store_true",
+                        help="with --seed, give every generation its own reproducible course")
+    parser.add_argument("--cache-size", type=int, default=1024, metavar="N",
+                        help="remember the fitness of up to N genomes on a fixed course (0 turns it off, "
+                             "unused with --halving-stages)")
+    parser.add_argument("--max-score", type=int, default=20,
+                        help="end an episode once the score goes past this")
+    parser.add_argument("--halving-stages", type=int, default=1, metavar="N",
+                        help="fly N progressively longer stages, promoting only the best birds of each one")
+    parser.add_argument("--profile", nargs="?", const="profile.csv", default=None, metavar="LOG",
+                        help="report where the time of every generation goes, and append it to LOG (.csv or .json)")
+    parser.add_argument("--spectate", type=int, nargs="?", const=1, default=None, metavar="K",
+                        help="train at full speed and watch the K fittest birds live (1 by default, 0 shows all)")
+    parser.add_argument("--checkpoint-every", type=int, default=5, metavar="N",
+                        help="save a checkpoint every N generations (0 turns it off)")
+    parser.add_argument("--resume", nargs="?", const="latest", default=None, metavar="CHECKPOINT",
+                        help="carry on from a checkpoint file, or from the newest one if no file is given")
+    parser.add_argument("--replay-log", default=None, metavar="FILE",
+                        help="append the replay of every generation's champion to FILE")
+    parser.add_argument("--export-replay", nargs="?", const="winner.replay", default=None, metavar="FILE",
+                        help="save the replay of the winner to FILE (winner.replay if no file is given)")
+    parser.add_argument("--play", default=None, metavar="FILE",
+                        help="watch the replays saved in FILE instead of training")
+    parser.add_argument("--islands", type=int, default=1, metavar="N",
+                        help="evolve N populations in parallel processes that exchange their best genomes")
+    parser.add_argument("--migration-interval", type=int, default=5, metavar="K",
+                        help="with --islands, generations between exchanges")
+    parser.add_argument("--migrants", type=int, default=2, metavar="M",
+                        help="with --islands, number of genomes every island sends to the next one")
+    args = parser.parse_args()
+    if args.play is not None:
+        for recorded in replay.load(args.play):
+            print(recorded)
+            play_replay(recorded)
+        raise SystemExit
+    if args.resume == "latest":
+        args.resume = checkpoint.latest()
+        if args.resume is None:
+            parser.error("--resume: there is no checkpoint to resume from")
+    if args.spectate is not None and args.headless:
+        parser.error("--spectate needs a window, it cannot be combined with --headless")
+    if args.islands > 1 and args.migration_interval < 1:
+        parser.error("--migration-interval must be 1 or more")
+    if args.islands > 1 and args.migrants < 1:
+        parser.error("--migrants must be 1 or more")
+
     local_dir = os.path.dirname(__file__)
     config_path = os.path.join(local_dir, 'config-feedforward.txt')
-    run(config_path)
+    run(config_path, headless=args.headless, render_every=args.render_every, render_best=args.render_best,
+        workers=args.workers, seed=args.seed, fresh_course=args.fresh_course, cache_size=args.cache_size,
+        max_score=args.max_score, halving_stages=args.halving_stages, profile=args.profile, spectate=args.spectate,
+        checkpoint_every=args.checkpoint_every, resume=args.resume, replay_log=args.replay_log,
+        export_replay=args.export_replay, islands=args.islands, migration_interval=args.migration_interval,
+        migrants=args.migrants)
@@ -1,20 +1,82 @@
-import csv, math
-from matplotlib import pyplot as plt
+import csv, math, os
+import numpy as np
+from stats_log import StatsLogReader
 
-def results_plot():
-    # Input and output file paths
-    input_file_path = 'fitness_history.csv'
-    output_file_path = 'output.csv'
+# The log written by flappy_bird.py while training (see stats_log.py), and the rounded copy of it in output.csv
+# Both are kept between calls, so showing the results again only reads the generations added since the last time
+LOG = StatsLogReader('fitness_log')
+OUTPUT_FILE_PATH = 'output.csv'
+# Longest history that is plotted point by point, longer ones are downsampled to this many points
+MAX_PLOT_POINTS = 2000
+
+# What was last written to output.csv: number of rows, and the file's (size, modification time) right after
+output_rows = 0
+output_signature = None
+
+def signature(path):
+    stat = os.stat(path)
+    return (stat.st_size, stat.st_mtime_ns)
+
+def lttb(x, y, threshold):
+    # Largest-Triangle-Three-Buckets downsampling: keeps the first and last point, and from every one of threshold - 2
+    # buckets in between, the point that makes the largest triangle with the point kept before it and the average of
+    # the next bucket. Keeps the shape of the curve (peaks included) far better than taking every Nth point.
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return x, y
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    keep = np.zeros(threshold, dtype=int)
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        keep[i + 1] = a
+    keep[-1] = n - 1
+    return x[keep], y[keep]
+
+def read_log():
+    # Read the new rows of the log and bring output.csv up to date with them
+    # output.csv is only appended to when it still holds what was last written to it, written again when the log
+    # was started over (or the file was changed by someone else), and not touched at all if nothing changed
+    global output_rows, output_signature
+    added, restarted = LOG.read()
+    best, average = LOG['best'], LOG['mean']
+
+    # An output.csv newer than the log (written by an earlier run of this module) is already up to date
+    if output_signature is None and os.path.exists(OUTPUT_FILE_PATH) and \
+            os.path.getmtime(OUTPUT_FILE_PATH) >= LOG.modified():
+        output_rows = len(LOG)
+        output_signature = signature(OUTPUT_FILE_PATH)
 
-    # Declare local lists for holding x and y values
-    x = []
+    unchanged = os.path.exists(OUTPUT_FILE_PATH) and signature(OUTPUT_FILE_PATH) == output_signature
+    if not unchanged or restarted or output_rows > len(LOG):
+        output_rows = 0
+        mode = 'w'
+    elif output_rows == len(LOG):
+        return best, average
+    else:
+        mode = 'a'
+
+    with open(OUTPUT_FILE_PATH, mode, newline='') as outfile:
+        csv_writer = csv.writer(outfile)
+        csv_writer.writerows(zip(np.round(best[output_rows:]).astype(int).tolist(),
+                                 np.round(average[output_rows:]).astype(int).tolist()))
+    output_rows = len(LOG)
+    output_signature = signature(OUTPUT_FILE_PATH)
+    return best, average
+
+def read_history():
+    # Runs from before the log existed only left fitness_history.csv behind, which is read (and converted) in full
+    input_file_path = 'fitness_history.csv'
     y1 = []
     y2 = []
-    curr_y = 0
-
 
     # Read the input file and write to the output file
-    with open(input_file_path, 'r', newline='') as infile, open(output_file_path, 'w', newline='') as outfile:
+    with open(input_file_path, 'r', newline='') as infile, open(OUTPUT_FILE_PATH, 'w', newline='') as outfile:
         csv_reader = csv.reader(infile)
         csv_writer = csv.writer(outfile)
 
@@ -26,13 +88,21 @@ def results_plot():
                     # Convert values to floats, round them, and convert to integers
                     rounded_values = [str(round(float(value))) for value in values]
                     csv_writer.writerow(rounded_values)
-                    x.append(curr_y)
-                    curr_y += 1
-                    y1. append(int(rounded_values[0]))
+                    y1.append(int(rounded_values[0]))
                     y2.append(int(rounded_values[1]))
+    return np.array(y1, dtype=float), np.array(y2, dtype=float)
+
+def results_plot():
+    if LOG.exists():
+        y1, y2 = read_log()
+    else:
+        y1, y2 = read_history()
+    x = np.arange(len(y1), dtype=float)
 
-    plt.plot(x, y1)
-    plt.plot(x, y2)
+    # matplotlib takes a while to import, so it is only loaded once there is something to show
+    from matplotlib import pyplot as plt
+    plt.plot(*lttb(x, y1, MAX_PLOT_POINTS))
+    plt.plot(*lttb(x, y2, MAX_PLOT_POINTS))
     plt.title("Simulation Results")
     plt.xlabel("Generation")
     plt.ylabel("Fitness")
@@ -41,4 +111,4 @@ def results_plot():
 
 # Enable it to run standalone
 if __name__ == '__main__':
-    results_plot()
\ No newline at end of file
+    results_plot()
@@ -0,0 +1,179 @@
+import copy, itertools, multiprocessing, os, queue, random, sys, traceback
+import neat
+from neat.math_util import mean, stdev
+import checkpoint
+from stats_log import StatsLog
+
+# Island model: several populations evolving side by side, one process each
+# Every island is an ordinary neat.Population on the shared config. Every 'interval' generations each island sends
+# copies of its best genomes to the next island (the islands form a ring), and takes in the ones sent by the
+# previous island in place of its newest offspring. Islands keep their own diversity in between, and good
+# solutions still spread. As soon as one island reaches the fitness threshold, all of them stop.
+# The main process collects one report per island and generation, and merges them into a single stream: a line per
+# generation on the terminal, the fitness log (see stats_log.py), and the overall winner at the end.
+
+
+class IslandReporter(neat.reporting.BaseReporter):
+    # Keeps what an island reports about the generation just evaluated
+    def __init__(self, migrants):
+        self.migrants = migrants
+        self.fitnesses = []
+        self.species = 0
+        self.best = []
+        self.solved = False
+
+    def post_evaluate(self, config, population, species, best_genome):
+        self.fitnesses = [genome.fitness for genome in population.values()]
+        self.species = len(species.species)
+        ranked = sorted(population.values(), key=lambda genome: genome.fitness, reverse=True)
+        self.best = [copy.deepcopy(genome) for genome in ranked[:self.migrants]]
+
+    def found_solution(self, config, generation, best):
+        self.solved = True
+
+
+def immigrate(p, migrants):
+    # Put copies of the migrants into the population in place of its newest offspring (the genomes with the highest
+    # keys, so elites are never replaced), then sort the population into species again
+    config = p.config
+    for key in sorted(p.population, reverse=True)[:len(migrants)]:
+        del p.population[key]
+    for migrant in migrants:
+        genome = copy.deepcopy(migrant)
+        genome.key = next(p.reproduction.genome_indexer)
+        genome.fitness = None
+        p.population[genome.key] = genome
+
+    # Migrants bring node keys from another island, so new nodes have to be numbered after all of them
+    highest = max(node for genome in p.population.values() for node in genome.nodes)
+    following = checkpoint.next_value(config.genome_config, "node_indexer")
+    config.genome_config.node_indexer = itertools.count(max(highest + 1, following or 0))
+    p.species.speciate(config, p.population, p.generation)
+
+
+def receive(inbox, stop):
+    # Wait for the migrants of the previous island, or None if the run was stopped in the meantime
+    while not stop.is_set():
+        try:
+            return inbox.get(timeout=0.1)
+        except queue.Empty:
+            pass
+    return None
+
+
+def island(index, config_file, options, generations, interval, migrants, inbox, outbox, results, stop):
+    # Body of an island process
+    # options: keyword arguments for flappy_bird.RUNNER.configure(), the seed is offset by the island's index
+    # Islands report to the main process, which prints for all of them
+    # Whatever happens, the island posts a last "done" or "error" message, so the main process never waits for it in vain.
+    # An island that failed also stops the others, its neighbour would otherwise wait for its migrants forever.
+    sys.stdout = open(os.devnull, "w")
+    # Migrants sent to an island that already stopped are never read, which must not keep this process from exiting
+    inbox.cancel_join_thread()
+    outbox.cancel_join_thread()
+
+    message = ("error", index, "stopped before it was done")
+    try:
+        from flappy_bird import RUNNER
+        RUNNER.headless = True
+        seed = options.get("seed")
+        RUNNER.configure(**options)
+        random.seed(None if seed is None else seed * 1000 + index)
+
+        config = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                                    neat.DefaultSpeciesSet, neat.DefaultStagnation,
+                                    config_file)
+        p = neat.Population(config)
+        reporter = IslandReporter(migrants)
+        p.add_reporter(reporter)
+
+        for generation in range(generations):
+            if stop.is_set():
+                break
+            p.run(RUNNER.eval_genomes, 1)
+            results.put(("generation", index, generation, reporter.fitnesses, reporter.species, reporter.best[0]))
+            if reporter.solved:
+                stop.set()
+                break
+
+            if (generation + 1) % interval == 0 and generation + 1 < generations:
+                outbox.put(reporter.best)
+                arrived = receive(inbox, stop)
+                if arrived is None:
+                    break
+                immigrate(p, arrived)
+
+        message = ("done", index, p.best_genome)
+    except BaseException:
+        message = ("error", index, traceback.format_exc())
+    finally:
+        if message[0] == "error":
+            stop.set()
+        results.put(message)
+
+
+def run_islands(config_file, islands, interval=5, migrants=2, generations=50, options=None):
+    # Evolve 'islands' populations in parallel for up to 'generations' generations, and return the overall winner
+    # interval: generations between migrations, migrants: number of genomes each island sends every time
+    # options: keyword arguments for flappy_bird.RUNNER.configure() (seed, fresh, cache_size, max_score, halving_stages)
+    # Raises RuntimeError if an island failed, with the traceback of the island
+    if interval < 1:
+        raise ValueError("islands have to exchange genomes every 1 or more generations, not {0}".format(interval))
+    if migrants < 1:
+        raise ValueError("islands have to send 1 or more migrants, not {0}".format(migrants))
+    # Islands only simulate, they never draw, so keep them quiet and windowless
+    os.environ["PYGAME_HIDE_SUPPORT_PROMPT"] = "1"
+    context = multiprocessing.get_context("spawn")
+    queues = [context.Queue() for _ in range(islands)]
+    results = context.Queue()
+    stop = context.Event()
+    processes = []
+    for i in range(islands):
+        process = context.Process(target=island, args=(
+            i, config_file, options or {}, generations, interval, migrants,
+            queues[i], queues[(i + 1) % islands], results, stop))
+        process.start()
+        processes.append(process)
+
+    # A generation is reported once every island that is still running has reported it
+    # Islands always post a last message, but one that was killed (out of memory, say) cannot, so the processes of the
+    # islands that are not done are checked whenever nothing arrives for a while
+    stats_log = StatsLog("fitness_log")
+    reports = {}
+    done = {}
+    reported = 0
+    try:
+        while len(done) < islands:
+            try:
+                message = results.get(timeout=1)
+            except queue.Empty:
+                for i, process in enumerate(processes):
+                    if i not in done and process.exitcode is not None:
+                        raise RuntimeError("island {0} exited with code {1} before it was done".format(
+                            i, process.exitcode))
+                continue
+            if message[0] == "error":
+                raise RuntimeError("island {0} failed:\n{1}".format(message[1], message[2]))
+            if message[0] == "done":
+                done[message[1]] = message[2]
+            else:
+                kind, index, generation, fitnesses, species, best = message
+                reports.setdefault(generation, {})[index] = (fitnesses, species, best)
+
+            while reported in reports and all(i in reports[reported] or i in done for i in range(islands)):
+                merged = reports.pop(reported)
+                fitnesses = [f for island_fitnesses, species, best in merged.values() for f in island_fitnesses]
+                species = sum(species for island_fitnesses, species, best in merged.values())
+                leader = max(merged, key=lambda i: merged[i][2].fitness)
+                print("Generation {0}: best fitness {1:.3f} (island {2}), average {3:.3f}, stdev {4:.3f}, {5} species on {6} islands".format(
+                    reported, merged[leader][2].fitness, leader, mean(fitnesses), stdev(fitnesses), species, len(merged)))
+                stats_log.append(fitnesses, species)
+                reported += 1
+    finally:
+        stop.set()
+        stats_log.close()
+        for process in processes:
+            process.join()
+
+    winners = [genome for genome in done.values() if genome is not None]
+    return max(winners, key=lambda genome: genome.fitness)
@@ -1,106 +1,157 @@
-import pygame, sys, random, os, neat
+import pygame, sys, os, argparse
 import flappy_bird
+import checkpoint
 import graph_results
+from assets import image, font
 from button import Button
 
+# python main.py --resume [CHECKPOINT]: the first simulation started from the menu carries on from a checkpoint
+# (the newest one if none is given), later ones start from scratch
+parser = argparse.ArgumentParser(description="Genetic Arcade main menu")
+parser.add_argument("--resume", nargs="?", const="latest", default=None, metavar="CHECKPOINT",
+                    help="carry on from a checkpoint file, or from the newest one if no file is given")
+RESUME = parser.parse_args().resume
+if RESUME == "latest":
+    RESUME = checkpoint.latest()
+
 pygame.init()
 
 SCREEN = pygame.display.set_mode((1280, 720))
 pygame.display.set_caption("Genetic Arcade")
 
-BG = pygame.image.load("assets/Background.png")
+BG = image("Background.png")
 
 def get_font(size): 
-    return pygame.font.Font("assets/font.otf", size)
+    # Fonts are loaded once per size and shared from then on
+    return font(size)
 
-def play():
-    # Start a 600x800 window for Flappy bird simulation run
-    SCREEN = pygame.display.set_mode((600, 800))
-    pygame.display.set_caption("Flappy Bird")
-    pygame.display.update()
+# The menu runs as a single loop that switches between screens (see main())
+# Every screen builds its text and buttons once, and answers to input:
+    # hover(position): update the buttons for the mouse position, returns True if the screen has to be drawn again
+    # click(position): returns the name of the screen to switch to, or None to stay
+# The loop sleeps until the next event arrives, and only draws when something changed
 
-    # Determine absolute path to the neural network config file ('config-feedforward.txt')
-    # Makes the file location process directory and OS independent
-    local_dir = os.path.dirname(__file__)
-    config_path = os.path.join(local_dir, 'config-feedforward.txt')
-    flappy_bird.run(config_path)
+class Screen:
+    def __init__(self):
+        self.buttons = []
 
-    # Go to the options screen after current simulation ends
-    options()
+    def enter(self):
+        # Called every time the screen is switched to
+        pass
 
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            pygame.quit()
-            sys.exit()
+    def hover(self, position):
+        changed = [button.changeColor(position) for button in self.buttons]
+        return any(changed)
 
-    
-def options():
-    SCREEN = pygame.display.set_mode((1280, 720))
-    graph_results.results_plot()
-    while True:
-        OPTIONS_MOUSE_POS = pygame.mouse.get_pos()
+    def click(self, position):
+        return None
 
-        SCREEN.fill("white")
+class MainMenu(Screen):
+    def __init__(self):
+        self.text = get_font(100).render("MAIN MENU", True, "#b68f40")
+        self.rect = self.text.get_rect(center=(640, 100))
 
-        OPTIONS_TEXT = get_font(45).render("Simulation Completed.", True, "Black")
-        OPTIONS_RECT = OPTIONS_TEXT.get_rect(center=(640, 260))
-        SCREEN.blit(OPTIONS_TEXT, OPTIONS_RECT)
-
-        OPTIONS_BACK = Button(image=None, pos=(640, 460), 
+        self.play_button = Button(image=image("Play Rect.png"), pos=(640, 250), 
+                            text_input="PLAY", font=get_font(75), base_color="#d7fcd4", hovering_color="White")
+        self.options_button = Button(image=image("Options Rect.png"), pos=(640, 400), 
+                            text_input="RESULTS", font=get_font(75), base_color="#d7fcd4", hovering_color="White")
+        self.quit_button = Button(image=image("Quit Rect.png"), pos=(640, 550), 
+                            text_input="QUIT", font=get_font(75), base_color="#d7fcd4", hovering_color="White")
+        self.buttons = [self.play_button, self.options_button, self.quit_button]
+
+    def draw(self, screen):
+        screen.blit(BG, (0, 0))
+        screen.blit(self.text, self.rect)
+        for button in self.buttons:
+            button.update(screen)
+
+    def click(self, position):
+        if self.play_button.checkForInput(position):
+            return "play"
+        if self.options_button.checkForInput(position):
+            return "options"
+        if self.quit_button.checkForInput(position):
+            return "quit"
+        return None
+
+class Options(Screen):
+    def __init__(self):
+        self.text = get_font(45).render("Simulation Completed.", True, "Black")
+        self.rect = self.text.get_rect(center=(640, 260))
+
+        self.back_button = Button(image=None, pos=(640, 460), 
                             text_input="BACK", font=get_font(75), base_color="Black", hovering_color="Green")
+        self.buttons = [self.back_button]
 
-        OPTIONS_BACK.changeColor(OPTIONS_MOUSE_POS)
-        OPTIONS_BACK.update(SCREEN)
+    def enter(self):
+        # Show the fitness graph of the last simulation before the screen itself
+        graph_results.results_plot()
 
-        
+    def draw(self, screen):
+        screen.fill("white")
+        screen.blit(self.text, self.rect)
+        for button in self.buttons:
+            button.update(screen)
 
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                if OPTIONS_BACK.checkForInput(OPTIONS_MOUSE_POS):
-                    main_menu()
+    def click(self, position):
+        if self.back_button.checkForInput(position):
+            return "main_menu"
+        return None
 
-        pygame.display.update()
+def play():
+    # Start a 600x800 window for Flappy bird simulation run
+    global RESUME
+    SCREEN = pygame.display.set_mode((600, 800))
+    pygame.display.set_caption("Flappy Bird")
+    pygame.display.update()
 
-def main_menu():
-    SCREEN = pygame.display.set_mode((1280, 720))
+    # Determine absolute path to the neural network config file ('config-feedforward.txt')
+    # Makes the file location process directory and OS independent
+    local_dir = os.path.dirname(__file__)
+    config_path = os.path.join(local_dir, 'config-feedforward.txt')
+    resume, RESUME = RESUME, None
+    flappy_bird.run(config_path, resume=resume)
+
+def main():
+    # Go from screen to screen until the window is closed or QUIT is clicked
+    # 'play' is not a screen: it runs a simulation, and then goes to the options screen
+    screens = dict(main_menu=MainMenu(), options=Options())
+    state = "main_menu"
     while True:
-        SCREEN.blit(BG, (0, 0))
-
-        MENU_MOUSE_POS = pygame.mouse.get_pos()
-
-        MENU_TEXT = get_font(100).render("MAIN MENU", True, "#b68f40")
-        MENU_RECT = MENU_TEXT.get_rect(center=(640, 100))
-
-        PLAY_BUTTON = Button(image=pygame.image.load("assets/Play Rect.png"), pos=(640, 250), 
-                            text_input="PLAY", font=get_font(75), base_color="#d7fcd4", hovering_color="White")
-        OPTIONS_BUTTON = Button(image=pygame.image.load("assets/Options Rect.png"), pos=(640, 400), 
-                            text_input="RESULTS", font=get_font(75), base_color="#d7fcd4", hovering_color="White")
-        QUIT_BUTTON = Button(image=pygame.image.load("assets/Quit Rect.png"), pos=(640, 550), 
-                            text_input="QUIT", font=get_font(75), base_color="#d7fcd4", hovering_color="White")
-
-        SCREEN.blit(MENU_TEXT, MENU_RECT)
-
-        for button in [PLAY_BUTTON, OPTIONS_BUTTON, QUIT_BUTTON]:
-            button.changeColor(MENU_MOUSE_POS)
-            button.update(SCREEN)
-        
-        for event in pygame.event.get():
+        if state == "quit":
+            pygame.quit()
+            sys.exit()
+        if state == "play":
+            play()
+            state = "options"
+            continue
+
+        screen = screens[state]
+        window = pygame.display.set_mode((1280, 720))
+        pygame.display.set_caption("Genetic Arcade")
+        screen.enter()
+        screen.hover(pygame.mouse.get_pos())
+
+        # Draw the screen, then only again after input that changed it
+        dirty = True
+        next_state = None
+        while next_state is None:
+            if dirty:
+                screen.draw(window)
+                pygame.display.update()
+                dirty = False
+
+            event = pygame.event.wait()
             if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                if PLAY_BUTTON.checkForInput(MENU_MOUSE_POS):
-                    play()
-                if OPTIONS_BUTTON.checkForInput(MENU_MOUSE_POS):
-                    options()
-                if QUIT_BUTTON.checkForInput(MENU_MOUSE_POS):
-                    pygame.quit()
-                    sys.exit()
-
-        pygame.display.update()
+                next_state = "quit"
+            elif event.type == pygame.MOUSEMOTION:
+                dirty = screen.hover(event.pos)
+            elif event.type == pygame.MOUSEBUTTONDOWN:
+                next_state = screen.click(event.pos)
+            elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED, pygame.WINDOWRESTORED):
+                # Parts of the window were covered or minimized, so it has to be drawn again
+                dirty = True
+        state = next_state
 
 # Launch the main menu
-main_menu()
\ No newline at end of file
+main()
@@ -0,0 +1,38 @@
+import multiprocessing
+import numpy as np
+
+
+class ParallelEvaluator(object):
+    # Evaluates a generation on several processes at once, in the spirit of neat.ParallelEvaluator
+    # neat.ParallelEvaluator hands every genome to the pool on its own. Our episodes simulate many birds together,
+    # so the generation is split into one contiguous chunk per worker instead, and every chunk is simulated as one episode.
+    # Workers are started with 'spawn', so they never inherit a window or display connection from this process.
+
+    def __init__(self, num_workers, eval_function, timeout=None):
+        # eval_function should take a list of genomes, the config object and any extra arguments given to evaluate(),
+        # and return the fitness of every genome, in order
+        self.num_workers = num_workers
+        self.eval_function = eval_function
+        self.timeout = timeout
+        self.pool = multiprocessing.get_context("spawn").Pool(num_workers)
+
+    def __del__(self):
+        self.close()
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def evaluate(self, genomes, config, *args):
+        # Returns the fitness of every genome, in the same order as the genomes
+        jobs = []
+        for chunk in np.array_split(np.arange(len(genomes)), self.num_workers):
+            if len(chunk):
+                jobs.append(self.pool.apply_async(self.eval_function, ([genomes[i] for i in chunk], config) + args))
+
+        fitness = []
+        for job in jobs:
+            fitness.extend(job.get(timeout=self.timeout))
+        return fitness
@@ -0,0 +1,103 @@
+import csv, json, os, time
+from neat.reporting import BaseReporter
+
+# Where the time of a generation goes
+# Episode.step() reports the time spent in each phase of a frame to a PhaseTimer, and ProfileReporter adds
+# the time NEAT spends on reproduction, then prints one line per generation and appends it to a log file.
+# When profiling is off there is no PhaseTimer at all, and the simulation only pays for a few 'is None' checks.
+
+PHASES = ("physics", "activate", "collide", "draw")
+
+
+class PhaseTimer(object):
+    # Accumulates the time spent in each phase of the simulation
+    # lap(phase) charges the time since the previous lap to 'phase', lap(None) only starts a new lap
+
+    def __init__(self):
+        self.totals = dict((phase, 0.0) for phase in PHASES)
+        self.frames = 0
+        self.last = time.perf_counter()
+
+    def lap(self, phase):
+        now = time.perf_counter()
+        if phase is not None:
+            self.totals[phase] += now - self.last
+        self.last = now
+
+    def frame(self):
+        self.frames += 1
+
+    def reset(self):
+        for phase in self.totals:
+            self.totals[phase] = 0.0
+        self.frames = 0
+        self.last = time.perf_counter()
+
+
+class ProfileReporter(BaseReporter):
+    # Reports the phase times of every generation, next to the output of neat.StdOutReporter
+    # log_path: file the rows are appended to, as JSON lines if it ends in .json or .jsonl, as CSV otherwise
+    # Phase times and frame counts only cover the episodes simulated in this process, not those on worker processes.
+    FIELDS = ("generation", "evaluate", "reproduce") + PHASES + ("frames", "fps", "births", "deaths")
+
+    def __init__(self, timer, log_path=None):
+        self.timer = timer
+        self.log_path = log_path
+        self.generation = None
+        self.generation_start = None
+        self.evaluate_end = None
+        self.population_keys = set()
+        self.births = self.deaths = 0
+        self.pending = False
+
+    def start_generation(self, generation):
+        self.generation = generation
+        self.timer.reset()
+        self.generation_start = time.perf_counter()
+
+    def post_evaluate(self, config, population, species, best_genome):
+        self.evaluate_end = time.perf_counter()
+
+        # Genomes that were not there last generation were born, the ones that are gone died
+        keys = set(population)
+        self.births = len(keys - self.population_keys)
+        self.deaths = len(self.population_keys - keys)
+        self.population_keys = keys
+        self.pending = True
+
+    def end_generation(self, config, population, species_set):
+        if self.pending:
+            self.report(time.perf_counter() - self.evaluate_end)
+
+    def found_solution(self, config, generation, best):
+        # The last generation does not reproduce, so it is reported here
+        if self.pending:
+            self.report(0.0)
+
+    def report(self, reproduce):
+        self.pending = False
+        evaluate = self.evaluate_end - self.generation_start
+        row = dict(generation=self.generation, evaluate=evaluate, reproduce=reproduce,
+                   frames=self.timer.frames, fps=self.timer.frames / evaluate if evaluate > 0 else 0.0,
+                   births=self.births, deaths=self.deaths)
+        row.update(self.timer.totals)
+
+        print("Profile: evaluate {0:.3f} sec ({1}), reproduce {2:.3f} sec".format(
+            evaluate, ", ".join("{0} {1:.3f}".format(phase, row[phase]) for phase in PHASES), reproduce))
+        print("Profile: {0} frames ({1:.0f} fps), {2} births, {3} deaths".format(
+            row["frames"], row["fps"], row["births"], row["deaths"]))
+
+        if self.log_path:
+            self.append(row)
+
+    def append(self, row):
+        if self.log_path.endswith((".json", ".jsonl")):
+            with open(self.log_path, "a") as f:
+                f.write(json.dumps(row) + "\n")
+        else:
+            new_file = not os.path.exists(self.log_path) or os.path.getsize(self.log_path) == 0
+            with open(self.log_path, "a", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=self.FIELDS)
+                if new_file:
+                    writer.writeheader()
+                writer.writerow(row)
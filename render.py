@@ -0,0 +1,88 @@
+import pygame
+
+# Drawing helpers that avoid redoing the same work every frame
+    # RotationCache: rotated copies of sprites, so an image is only rotated once for every angle it is drawn at
+    # Label: a text surface that is only rendered again when its text changes
+    # Renderer: keeps track of the parts of the window drawn to (dirty rectangles), and only sends those to the display
+
+
+class RotationCache(object):
+    # Rotated copies of images, keyed by the image and the angle
+    # Birds only ever tilt to a handful of angles, so this stays small
+
+    def __init__(self):
+        self.cache = {}
+
+    def get(self, image, angle):
+        key = (image, angle)
+        rotated = self.cache.get(key)
+        if rotated is None:
+            rotated = self.cache[key] = pygame.transform.rotate(image, angle)
+        return rotated
+
+    def blit(self, surf, image, topleft, angle):
+        # Draw the image rotated around its center, and return the rectangle drawn to
+        rotated = self.get(image, angle)
+        rect = rotated.get_rect(center=image.get_rect(topleft=topleft).center)
+        return surf.blit(rotated, rect.topleft)
+
+
+class Label(object):
+    # A line of text that is only rendered again when the text changes
+
+    def __init__(self, font, color):
+        self.font = font
+        self.color = color
+        self.text = None
+        self.surface = None
+
+    def render(self, text):
+        if text != self.text:
+            self.text = text
+            self.surface = self.font.render(text, 1, self.color)
+        return self.surface
+
+
+class Renderer(object):
+    # Draws frames onto a window, and only updates the parts of the display that changed
+    # At the start of a frame, the areas drawn to in the previous frame are restored from the background.
+    # At the end, only those areas and the ones drawn to in this frame are sent to the display.
+    # Everything drawn has to be drawn again every frame it should stay visible, which is the case for
+    # everything in the simulation since it all moves.
+
+    def __init__(self, win, background):
+        self.win = win
+        self.background = background
+        self.previous = []
+        self.current = []
+        self.full = True
+
+    def invalidate(self):
+        # Redraw and update the whole window on the next frame, for example after something else drew on it
+        self.full = True
+
+    def begin(self):
+        # Start a new frame by restoring the background
+        if self.full:
+            self.win.blit(self.background, (0, 0))
+        else:
+            for rect in self.previous:
+                self.win.blit(self.background, rect, rect)
+
+    def blit(self, surface, pos):
+        return self.mark(self.win.blit(surface, pos))
+
+    def mark(self, rect):
+        # Remember an area that was drawn to in this frame
+        self.current.append(rect)
+        return rect
+
+    def end(self):
+        # Send the frame to the display
+        if self.full:
+            pygame.display.update()
+            self.full = False
+        else:
+            pygame.display.update(self.previous + self.current)
+        self.previous = self.current
+        self.current = []
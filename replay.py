@@ -0,0 +1,130 @@
+import struct
+
+# Compact recordings of single birds' flights
+# A bird's flight only depends on the course and on the frames it jumped in, so that is all a Replay stores:
+# the course seed, which genome flew (and in which generation), how many frames the flight lasted, the fitness it
+# earned, and the frames with a jump. Jump frames are stored as the gaps between them, as varints (7 bits per
+# byte), which is a single byte per jump for any bird that jumps at least every 128 frames.
+# A replay file is the MAGIC bytes followed by any number of length-prefixed replays, so replays can be appended.
+# Course seeds can be negative (--seed -1), so they are zigzag encoded: 0, -1, 1, -2, ... are stored as 0, 1, 2, 3, ...
+# Files written before that (LEGACY_MAGIC) stored the seed as a plain varint, and can still be loaded.
+
+MAGIC = b"FBRPLAY2"
+LEGACY_MAGIC = b"FBREPLAY"
+
+
+def write_varint(out, value):
+    # Unsigned integer, 7 bits per byte, lowest bits first, the high bit set on every byte but the last
+    if value < 0:
+        raise ValueError("varints cannot hold negative values, got {0}".format(value))
+    while True:
+        byte = value & 0x7f
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return
+
+
+def read_varint(data, pos):
+    # Returns the value and the position after it
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        shift += 7
+        if not byte & 0x80:
+            return value, pos
+
+
+def zigzag(value):
+    # Signed integer as an unsigned one, small magnitudes stay small
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+
+def unzigzag(value):
+    return value // 2 if not value & 1 else -(value + 1) // 2
+
+
+class Replay(object):
+    # course_seed: seed of the Course that was flown, genome_id: key of the genome, generation: when it flew
+    # frames: number of frames simulated, fitness: fitness earned, jumps: sorted frame numbers the bird jumped in
+
+    def __init__(self, course_seed, genome_id, generation, frames, fitness, jumps):
+        self.course_seed = course_seed
+        self.genome_id = genome_id
+        self.generation = generation
+        self.frames = frames
+        self.fitness = fitness
+        self.jumps = list(jumps)
+
+    def __repr__(self):
+        return "Replay(genome {0}, generation {1}, {2} frames, {3} jumps, fitness {4})".format(
+            self.genome_id, self.generation, self.frames, len(self.jumps), self.fitness)
+
+    def to_bytes(self):
+        out = bytearray()
+        for value in (zigzag(self.course_seed), self.genome_id, self.generation, self.frames, len(self.jumps)):
+            write_varint(out, value)
+        out += struct.pack("<d", self.fitness)
+        previous = 0
+        for frame in self.jumps:
+            write_varint(out, frame - previous)
+            previous = frame
+        return bytes(out)
+
+    @staticmethod
+    def from_bytes(data, legacy=False):
+        # legacy: the replay comes from a LEGACY_MAGIC file, with the course seed not zigzag encoded
+        pos = 0
+        values = []
+        for _ in range(5):
+            value, pos = read_varint(data, pos)
+            values.append(value)
+        course_seed, genome_id, generation, frames, count = values
+        if not legacy:
+            course_seed = unzigzag(course_seed)
+        fitness, = struct.unpack_from("<d", data, pos)
+        pos += 8
+        jumps = []
+        frame = 0
+        for _ in range(count):
+            gap, pos = read_varint(data, pos)
+            frame += gap
+            jumps.append(frame)
+        return Replay(course_seed, genome_id, generation, frames, fitness, jumps)
+
+
+def save(path, replays, append=False):
+    # Write replays to a file, or add them to the end of it
+    mode = "a+b" if append else "wb"
+    with open(path, mode) as f:
+        if f.tell() == 0:
+            f.write(MAGIC)
+        else:
+            f.seek(0)
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError("{0} is not a replay file of this version, replays cannot be added to it".format(path))
+        for replay in replays:
+            data = replay.to_bytes()
+            header = bytearray()
+            write_varint(header, len(data))
+            f.write(bytes(header) + data)
+
+
+def load(path):
+    # All replays in a file, in the order they were saved
+    with open(path, "rb") as f:
+        data = f.read()
+    legacy = data.startswith(LEGACY_MAGIC)
+    if not data.startswith(MAGIC) and not legacy:
+        raise ValueError("{0} is not a replay file".format(path))
+    replays = []
+    pos = len(MAGIC)
+    while pos < len(data):
+        length, pos = read_varint(data, pos)
+        replays.append(Replay.from_bytes(data[pos:pos + length], legacy))
+        pos += length
+    return replays
@@ -0,0 +1,62 @@
+import math
+
+# Evaluation schedules decide how long every genome of a generation gets to fly
+# A schedule's evaluate() receives the genomes and a function run(genomes, max_score), which simulates the given
+# genomes on the generation's course until they crash or the score passes max_score. run() returns one
+# (fitness, survived, clearance) tuple per genome:
+    # fitness: fitness earned in that episode
+    # survived: whether the bird was still flying when the score limit was reached
+    # clearance: closest the bird came to a pipe, in pixels (larger is safer)
+# evaluate() returns one (fitness, final) pair per genome, where final tells whether the fitness is the one the
+# genome would get from flying the whole schedule on its own, so it is safe to remember (see FitnessCache)
+
+
+class FullEpisode(object):
+    # Every genome flies until it crashes or the score passes max_score
+    def __init__(self, max_score=20):
+        self.max_score = max_score
+
+    def evaluate(self, genomes, run):
+        return [(fitness, True) for fitness, survived, clearance in run(genomes, self.max_score)]
+
+
+class SuccessiveHalving(object):
+    # Every genome flies a short course first, and only the best of the birds still flying at its end
+    # go on to progressively longer courses, until the last stage reaches max_score
+    # Most birds crash early anyway, and a crashed bird scores the same on any longer course, so only the
+    # birds that survived a stage are candidates for the next one. Of those, the best 'keep' fraction
+    # (ranked by fitness, then by how safely they cleared the pipes) is promoted.
+    # Every stage flies the start of the same course again, so fitness is always measured the same way:
+    # a bird that is not promoted keeps the fitness it had at the end of its last stage, exactly as if that
+    # stage's score limit had been the limit for the whole generation.
+
+    def __init__(self, max_score=20, stages=3, keep=0.5):
+        self.max_score = max_score
+        self.keep = keep
+
+        # Score limits of the stages, halving from max_score downwards, e.g. 5, 10, 20
+        self.limits = sorted(set(max(1, int(max_score / 2**k)) for k in range(stages)))
+
+    def evaluate(self, genomes, run):
+        results = [None] * len(genomes)
+        active = list(range(len(genomes)))
+
+        for stage, limit in enumerate(self.limits):
+            scored = run([genomes[i] for i in active], limit)
+            last = stage == len(self.limits) - 1
+
+            survivors = []
+            for i, (fitness, survived, clearance) in zip(active, scored):
+                # Birds that crashed already have their final fitness
+                results[i] = (fitness, last or not survived)
+                if survived:
+                    survivors.append((fitness, clearance, i))
+
+            if last or not survivors:
+                break
+
+            survivors.sort(key=lambda s: (s[0], s[1]), reverse=True)
+            promoted = survivors[:max(1, int(math.ceil(len(survivors) * self.keep)))]
+            active = sorted(i for fitness, clearance, i in promoted)
+
+        return results
@@ -0,0 +1,71 @@
+import collections, threading
+import pygame
+
+# Watching a training run without slowing it down
+# The simulation runs on a background thread as fast as it can, and publishes a snapshot of every frame into a
+# small ring buffer. The main thread (which owns the window) wakes up at display rate, draws the newest snapshot
+# and throws away the ones it did not get to. If the simulation outpaces the display, frames are dropped instead
+# of the simulation waiting for them to be drawn.
+
+
+class SnapshotBuffer(object):
+    # Bounded, thread safe ring buffer of snapshots, from one producer to one consumer
+    # Once it is full, publishing a snapshot pushes out the oldest one
+
+    def __init__(self, capacity=8):
+        self.frames = collections.deque(maxlen=capacity)
+        self.lock = threading.Lock()
+        self.published = 0
+        self.dropped = 0
+
+    def publish(self, snapshot):
+        with self.lock:
+            if len(self.frames) == self.frames.maxlen:
+                self.dropped += 1
+            self.frames.append(snapshot)
+            self.published += 1
+
+    def latest(self):
+        # The newest snapshot, or None if nothing was published since the last call
+        # Older snapshots still in the buffer are dropped
+        with self.lock:
+            if not self.frames:
+                return None
+            snapshot = self.frames.pop()
+            self.dropped += len(self.frames)
+            self.frames.clear()
+            return snapshot
+
+
+class Worker(threading.Thread):
+    # Runs function(*args) on a background thread, keeping its result or the exception it raised
+    # The thread is a daemon, so closing the window ends the program without waiting for it
+
+    def __init__(self, function, *args):
+        threading.Thread.__init__(self, daemon=True)
+        self.function = function
+        self.args = args
+        self.result = None
+        self.error = None
+
+    def run(self):
+        try:
+            self.result = self.function(*self.args)
+        except BaseException as e:
+            self.error = e
+
+
+def watch(buffer, worker, draw, fps=60):
+    # Draw the newest snapshot of the buffer with draw(snapshot), at most fps times per second, until the worker is done
+    # Must run on the main thread, which is the one allowed to handle window events
+    # Returns False if the window was closed
+    clock = pygame.time.Clock()
+    while worker.is_alive():
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                return False
+        snapshot = buffer.latest()
+        if snapshot is not None:
+            draw(snapshot)
+        clock.tick(fps)
+    return True
@@ -0,0 +1,105 @@
+import os, time
+import numpy as np
+from neat.reporting import BaseReporter
+from neat.math_util import mean, stdev
+
+# Fitness statistics of every generation, appended to disk as they happen
+# The log is a folder with one file per column, each a plain array of little endian 64 bit floats, so row i of the
+# log is the i-th value of every file. Appending a generation writes 8 bytes per column, and a reader that already
+# has the first n rows only reads what comes after them.
+# The 'run' file holds a token that changes whenever a writer starts over or cuts the log short (when resuming
+# from an older checkpoint), which tells readers to read the whole log again.
+
+COLUMNS = ("best", "mean", "stdev", "species")
+DTYPE = np.dtype("<f8")
+
+
+def column_path(path, column):
+    return os.path.join(path, column + ".f64")
+
+
+class StatsLog(BaseReporter):
+    # NEAT reporter that appends one row per generation to the log in the folder 'path'
+    # keep: number of rows of an existing log to keep (the generations done before resuming), the rest is dropped
+
+    def __init__(self, path="fitness_log", keep=0):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.files = {}
+        cut = not os.path.exists(os.path.join(path, "run"))
+        for column in COLUMNS:
+            f = open(column_path(path, column), "a+b")
+            size = os.path.getsize(column_path(path, column))
+            if size > keep * DTYPE.itemsize:
+                f.truncate(keep * DTYPE.itemsize)
+                cut = True
+            self.files[column] = f
+
+        # Readers only need to start over if rows they may have read are gone
+        if cut:
+            with open(os.path.join(path, "run"), "w") as f:
+                f.write("{0}-{1}".format(os.getpid(), time.time_ns()))
+
+    def post_evaluate(self, config, population, species, best_genome):
+        fitnesses = [genome.fitness for genome in population.values()]
+        self.append(fitnesses, len(species.species))
+
+    def append(self, fitnesses, species):
+        # Add the row of a generation with the given fitness values and number of species
+        row = dict(best=max(fitnesses), mean=mean(fitnesses), stdev=stdev(fitnesses), species=species)
+        for column in COLUMNS:
+            f = self.files[column]
+            f.write(np.array(row[column], dtype=DTYPE).tobytes())
+            f.flush()
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+        self.files = {}
+
+
+class StatsLogReader(object):
+    # Reads a log written by StatsLog, picking up only the rows added since the last read()
+
+    def __init__(self, path="fitness_log"):
+        self.path = path
+        self.run = None
+        self.columns = dict((column, np.zeros(0, dtype=DTYPE)) for column in COLUMNS)
+
+    def exists(self):
+        return os.path.exists(os.path.join(self.path, "run"))
+
+    def read(self):
+        # Returns the number of rows read (all of them if the log was started over), and whether it was started over
+        with open(os.path.join(self.path, "run")) as f:
+            run = f.read()
+        restarted = run != self.run
+        if restarted:
+            self.run = run
+            self.columns = dict((column, np.zeros(0, dtype=DTYPE)) for column in COLUMNS)
+
+        # Columns are written one after the other, so only rows that are complete in every column are taken
+        known = len(self.columns[COLUMNS[0]])
+        rows = min(os.path.getsize(column_path(self.path, column)) for column in COLUMNS) // DTYPE.itemsize
+        if rows < known:
+            # Cut short without a new token, start over anyway
+            self.run = None
+            return self.read()
+        if rows > known:
+            for column in COLUMNS:
+                with open(column_path(self.path, column), "rb") as f:
+                    f.seek(known * DTYPE.itemsize)
+                    new = np.frombuffer(f.read((rows - known) * DTYPE.itemsize), dtype=DTYPE)
+                self.columns[column] = np.concatenate((self.columns[column], new))
+        return rows - (0 if restarted else known), restarted
+
+    def modified(self):
+        # Time the log was last written to
+        return max(os.path.getmtime(os.path.join(self.path, name))
+                   for name in ["run"] + [column + ".f64" for column in COLUMNS])
+
+    def __len__(self):
+        return len(self.columns[COLUMNS[0]])
+
+    def __getitem__(self, column):
+        return self.columns[column]
@@ -0,0 +1,303 @@
+import argparse, contextlib, csv, hashlib, itertools, json, math, multiprocessing, os, random, re, sys, time
+import neat
+
+# Hyperparameter sweeps over config-feedforward.txt
+# A sweep spec (a JSON file) lists the config keys to vary and the values to try, either every combination of them
+# (grid) or a number of random draws (random). Every variant is trained headless with the same seed in a pool of
+# processes, and one row per trial is appended to a results table as soon as the trial is done: the parameters,
+# the number of generations it took to reach the fitness threshold, the best fitness and the wall time.
+# Trials are named after a hash of their parameters, the seed, the generations and the base config, so running the
+# same sweep again skips every trial that is already in the table.
+#
+# Spec format:
+#   {"mode": "grid",                  "grid" or "random"
+#    "trials": 20,                    number of draws in random mode
+#    "seed": 0,                       seed every trial is trained with (and random mode draws with)
+#    "generations": 50,               generations every trial runs for at most
+#    "parameters": {
+#        "pop_size": [10, 50, 100],                                a list of values (grid, or a random choice)
+#        "DefaultGenome.conn_add_prob": [0.3, 0.5],                keys can name their section if it is not obvious
+#        "compatibility_threshold": {"min": 2.0, "max": 4.0}}}     a range to draw from (random mode only)
+# Ranges are drawn uniformly, as integers if both ends are integers, and on a log scale with "log": true.
+
+KEY_LINE = re.compile(r"^(\s*)(\w+)(\s*=\s*)(.*?)(\s*)$")
+RESULT_FIELDS = ("status", "generations", "best_fitness", "wall_time")
+
+
+def parse_config(text):
+    # Returns {key: section} for every key of a NEAT config file, and the list of keys that appear in several sections
+    sections = {}
+    repeated = set()
+    section = None
+    for line in text.splitlines():
+        stripped = line.strip()
+        if stripped.startswith("[") and stripped.endswith("]"):
+            section = stripped[1:-1]
+            continue
+        match = KEY_LINE.match(line)
+        if match and not stripped.startswith("#") and section is not None:
+            key = match.group(2)
+            if key in sections:
+                repeated.add(key)
+            sections[key] = section
+    return sections, repeated
+
+
+def resolve(text, names):
+    # Turns the parameter names of a spec into (section, key) pairs, checking that they exist in the base config
+    sections, repeated = parse_config(text)
+    resolved = {}
+    for name in names:
+        section, _, key = name.rpartition(".")
+        if key not in sections:
+            raise ValueError("unknown config key {0!r}".format(name))
+        if not section:
+            if key in repeated:
+                raise ValueError("config key {0!r} is in several sections, write it as Section.{0}".format(key))
+            section = sections[key]
+        resolved[name] = (section, key)
+    return resolved
+
+
+def variant(text, values, resolved):
+    # The base config text with the values of the given parameters replaced, keeping the layout and comments
+    replace = dict((resolved[name], value) for name, value in values.items())
+    lines = []
+    section = None
+    for line in text.splitlines(True):
+        stripped = line.strip()
+        if stripped.startswith("[") and stripped.endswith("]"):
+            section = stripped[1:-1]
+        else:
+            match = KEY_LINE.match(line.rstrip("\r\n"))
+            if match and not stripped.startswith("#") and (section, match.group(2)) in replace:
+                ending = line[len(line.rstrip("\r\n")):]
+                line = match.group(1) + match.group(2) + match.group(3) + str(replace[(section, match.group(2))]) + ending
+        lines.append(line)
+    return "".join(lines)
+
+
+def draw(rng, choices):
+    # One random value of a parameter: a choice from a list, or a draw from a {"min", "max"} range
+    if isinstance(choices, list):
+        return rng.choice(choices)
+    if not isinstance(choices, dict):
+        return choices
+    low, high = choices["min"], choices["max"]
+    if choices.get("log"):
+        value = 10 ** rng.uniform(math.log10(low), math.log10(high))
+    else:
+        value = rng.uniform(low, high)
+    if isinstance(low, int) and isinstance(high, int):
+        return int(round(value))
+    return round(value, 6)
+
+
+def expand(spec):
+    # Returns the parameter values of every trial of the sweep, in order
+    parameters = spec["parameters"]
+    names = list(parameters)
+    mode = spec.get("mode", "grid")
+    if mode == "grid":
+        for name in names:
+            if isinstance(parameters[name], dict):
+                raise ValueError("{0}: ranges can only be used in random mode, give a list of values".format(name))
+        lists = [parameters[name] if isinstance(parameters[name], list) else [parameters[name]] for name in names]
+        return [dict(zip(names, values)) for values in itertools.product(*lists)]
+    if mode == "random":
+        # Draws only depend on the seed, so a resumed sweep draws the same trials again
+        rng = random.Random(spec.get("seed", 0))
+        return [dict((name, draw(rng, parameters[name])) for name in names) for _ in range(spec["trials"])]
+    raise ValueError("unknown sweep mode {0!r}, use 'grid' or 'random'".format(mode))
+
+
+def trial_id(values, seed, generations, base):
+    key = json.dumps(dict(values=values, seed=seed, generations=generations, base=base), sort_keys=True)
+    return hashlib.sha1(key.encode()).hexdigest()[:12]
+
+
+class ThresholdReporter(neat.reporting.BaseReporter):
+    # Remembers the generation the fitness threshold was reached in, and the best fitness seen
+    def __init__(self):
+        self.solved_at = None
+        self.best = None
+
+    def post_evaluate(self, config, population, species, best_genome):
+        if self.best is None or best_genome.fitness > self.best:
+            self.best = best_genome.fitness
+
+    def found_solution(self, config, generation, best):
+        self.solved_at = generation
+
+
+def run_trial(trial, config_path, seed, generations, log_path):
+    # Body of a worker: train one variant headless, the same way 'flappy_bird.py --headless --seed' does,
+    # and return its row of the results table. Its output goes to log_path.
+    with open(log_path, "w") as log, contextlib.redirect_stdout(log):
+        from flappy_bird import RUNNER
+        RUNNER.headless = True
+        RUNNER.configure(seed)
+        random.seed(seed)
+        config = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                                    neat.DefaultSpeciesSet, neat.DefaultStagnation,
+                                    config_path)
+        p = neat.Population(config)
+        p.add_reporter(neat.StdOutReporter(True))
+        reporter = ThresholdReporter()
+        p.add_reporter(reporter)
+
+        start = time.perf_counter()
+        try:
+            p.run(RUNNER.eval_genomes, generations)
+            status = "solved" if reporter.solved_at is not None else "unsolved"
+        except neat.population.CompleteExtinctionException:
+            # A result like any other: with the same seed, the variant would die out again
+            status = "extinct"
+        except Exception as e:
+            # Trials that failed are tried again when the sweep is resumed
+            print("{0}: {1}".format(type(e).__name__, e))
+            status = "error"
+        wall_time = time.perf_counter() - start
+
+    return dict(trial=trial, status=status,
+                generations="" if reporter.solved_at is None else reporter.solved_at + 1,
+                best_fitness="" if reporter.best is None else round(reporter.best, 3), wall_time=round(wall_time, 3))
+
+
+def read_results(path):
+    # The rows of an existing results table, and its columns
+    if not os.path.exists(path):
+        return [], []
+    with open(path, newline="") as f:
+        reader = csv.DictReader(f)
+        return list(reader), reader.fieldnames or []
+
+
+def write_results(path, rows, fields):
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fields, restval="")
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def sweep(spec, config_file, output="sweep", workers=0):
+    # Run every trial of the spec that is not in the results table yet, and return the whole table
+    # workers: number of trials trained at once, 0 uses every core
+    with open(config_file) as f:
+        base = f.read()
+    seed = spec.get("seed", 0)
+    generations = spec.get("generations", 50)
+    resolved = resolve(base, spec["parameters"])
+    trials = expand(spec)
+
+    configs_dir = os.path.join(output, "configs")
+    logs_dir = os.path.join(output, "logs")
+    os.makedirs(configs_dir, exist_ok=True)
+    os.makedirs(logs_dir, exist_ok=True)
+    results_path = os.path.join(output, "results.csv")
+
+    # Trials that failed are run again, all others are done
+    rows, fields = read_results(results_path)
+    rows = [row for row in rows if row.get("status") != "error"]
+    done = set(row["trial"] for row in rows)
+
+    # Parameters of this sweep get a column each, next to those of earlier sweeps into the same table
+    parameter_fields = [name for name in fields if name not in ("trial",) + RESULT_FIELDS]
+    parameter_fields += [name for name in spec["parameters"] if name not in parameter_fields]
+    fields = ["trial"] + parameter_fields + list(RESULT_FIELDS)
+    write_results(results_path, rows, fields)
+
+    # Every variant gets its own config file, and is checked by NEAT before any training starts
+    jobs = []
+    values_of = {}
+    for values in trials:
+        trial = trial_id(values, seed, generations, base)
+        if trial in done or trial in values_of:
+            continue
+        values_of[trial] = values
+        config_path = os.path.join(configs_dir, trial + ".txt")
+        with open(config_path, "w") as f:
+            f.write(variant(base, values, resolved))
+        neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                           neat.DefaultSpeciesSet, neat.DefaultStagnation, config_path)
+        jobs.append((trial, config_path, seed, generations, os.path.join(logs_dir, trial + ".log")))
+
+    print("Sweep: {0} trials, {1} already done, {2} to run".format(len(trials), len(trials) - len(jobs), len(jobs)))
+    if jobs:
+        # Workers only simulate, they never draw, so keep them quiet and windowless
+        os.environ["PYGAME_HIDE_SUPPORT_PROMPT"] = "1"
+        pool = multiprocessing.get_context("spawn").Pool(min(workers or os.cpu_count(), len(jobs)))
+        try:
+            pending = [pool.apply_async(run_trial, job) for job in jobs]
+            # Rows are appended as trials finish, so an interrupted sweep keeps everything done so far
+            with open(results_path, "a", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=fields, restval="")
+                for count, job in enumerate(as_completed(pending), 1):
+                    row = job.get()
+                    row.update(values_of[row["trial"]])
+                    writer.writerow(row)
+                    f.flush()
+                    rows.append(row)
+                    print("Sweep: trial {0} ({1}/{2}) {3} after {4} generations, best fitness {5}, {6} sec".format(
+                        row["trial"], count, len(jobs), row["status"], row["generations"] or generations,
+                        row["best_fitness"], row["wall_time"]))
+        finally:
+            pool.terminate()
+            pool.join()
+    return rows, fields
+
+
+def as_completed(pending):
+    # Yields the async results of a pool in the order they finish
+    pending = list(pending)
+    while pending:
+        for job in pending:
+            if job.ready():
+                pending.remove(job)
+                yield job
+                break
+        else:
+            pending[0].wait(0.1)
+
+
+def ranking(row):
+    # Trials that reached the threshold first come first, then the ones with the best fitness
+    generations = int(row["generations"]) if row["generations"] not in ("", None) else float("inf")
+    best = float(row["best_fitness"]) if row["best_fitness"] not in ("", None) else float("-inf")
+    return (generations, -best, float(row["wall_time"]))
+
+
+def print_table(rows, fields):
+    widths = dict((name, max([len(name)] + [len(str(row.get(name, ""))) for row in rows])) for name in fields)
+    print("  ".join(name.ljust(widths[name]) for name in fields))
+    for row in sorted(rows, key=ranking):
+        print("  ".join(str(row.get(name, "")).ljust(widths[name]) for name in fields))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train variants of config-feedforward.txt and compare them")
+    parser.add_argument("spec", help="JSON file with the sweep spec (see the top of sweep.py)")
+    parser.add_argument("--output", default="sweep", metavar="DIR",
+                        help="folder for the results table, the variant configs and the trial logs")
+    parser.add_argument("--workers", type=int, default=0, metavar="N",
+                        help="number of trials trained at once (0 uses every core)")
+    parser.add_argument("--config", default=None, help="base config file (config-feedforward.txt by default)")
+    args = parser.parse_args(argv)
+
+    with open(args.spec) as f:
+        spec = json.load(f)
+    config_file = args.config or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config-feedforward.txt')
+    try:
+        rows, fields = sweep(spec, config_file, args.output, args.workers)
+    except (ValueError, KeyError) as e:
+        parser.error(str(e))
+    except KeyboardInterrupt:
+        print("\nSweep interrupted, run it again to carry on with the trials that were not done")
+        return 130
+    print()
+    print_table(rows, fields)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,411 @@
+import os, pickle, random
+import numpy as np
+import neat
+import pytest
+import assets
+import batch_runner
+import checkpoint
+import flappy_bird
+import graph_results
+import islands
+import replay
+import sweep
+from batch_network import BatchNetwork
+from course import Course
+from fitness_cache import FitnessCache, genome_key
+from flappy_bird import Bird, BirdPopulation, FlappyBird, Pipe
+from parallel import ParallelEvaluator
+from schedule import FullEpisode, SuccessiveHalving
+from stats_log import StatsLog, StatsLogReader
+
+# Seeded, headless checks of what the modules promise, most of all that the faster code paths give the same
+# results as the code they replace
+# Run with 'python -m pytest -q' from this folder
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CONFIG = os.path.join(HERE, "config-feedforward.txt")
+
+
+def load_config():
+    return neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                              neat.DefaultSpeciesSet, neat.DefaultStagnation, CONFIG)
+
+
+def make_genomes(config, count, seed, mutations=30):
+    # Genomes of all shapes, from bare ones to some with hidden nodes and disabled connections
+    random.seed(seed)
+    genomes = []
+    for key in range(count):
+        genome = config.genome_type(key)
+        genome.configure_new(config.genome_config)
+        for _ in range(random.randrange(mutations)):
+            genome.mutate(config.genome_config)
+        genomes.append(genome)
+    return genomes
+
+
+def test_population_move_matches_bird_move():
+    rng = np.random.RandomState(0)
+    size = 50
+    birds = [Bird(230, 350) for _ in range(size)]
+    population = BirdPopulation(size, 230, 350)
+    for frame in range(300):
+        jump = rng.rand(size) < 0.1
+        for bird, jumped in zip(birds, jump):
+            if jumped:
+                bird.jump()
+            bird.move()
+        population.jump(jump)
+        population.move()
+        assert population.y.tolist() == [bird.y for bird in birds]
+        assert population.tilt.tolist() == [bird.tilt for bird in birds]
+        assert population.vel.tolist() == [bird.vel for bird in birds]
+
+
+def test_batch_network_matches_feedforward_network():
+    # To within rounding, NumPy may add up the inputs of a node in another order
+    config = load_config()
+    genomes = make_genomes(config, 300, seed=3)
+    inputs = np.random.RandomState(0).uniform(-400, 800, (len(genomes), 3))
+    expected = np.array([neat.nn.FeedForwardNetwork.create(genome, config).activate(tuple(row))
+                         for genome, row in zip(genomes, inputs.tolist())])
+
+    nets = BatchNetwork.create(genomes, config)
+    np.testing.assert_allclose(nets.activate(inputs), expected, rtol=1e-12, atol=1e-15)
+    # Only some of the networks, as done once birds have crashed
+    rows = np.arange(0, len(genomes), 7)
+    np.testing.assert_allclose(nets.activate(inputs[rows], rows), expected[rows], rtol=1e-12, atol=1e-15)
+
+
+def test_collide_all_matches_masks():
+    rng = np.random.RandomState(0)
+    size = 2000
+    birds = BirdPopulation(size, 230, 350)
+    birds.y = rng.uniform(-60, 800, size)
+    # Exact halves, where rounding to the pixel row matters
+    birds.y[:50] = np.arange(50) + 0.5
+    birds.frame = rng.randint(0, 3, size)
+    birds.alive = rng.rand(size) < 0.9
+
+    for x, height in ((200, 50), (215, 250), (240, 450), (180, 300)):
+        pipe = Pipe(x, height)
+        got = pipe.collide_all(birds)
+        expected = [bool(birds.alive[i]) and bool(pipe.collide(birds[i], None)) for i in range(size)]
+        assert got.tolist() == expected
+        # Both outcomes have to be covered for the check to mean anything
+        assert 0 < sum(expected) < birds.count()
+
+
+@pytest.mark.parametrize("schedule", [FullEpisode(20), SuccessiveHalving(8, 3)], ids=["full", "halving"])
+def test_parallel_matches_serial(schedule):
+    config = load_config()
+    genomes = make_genomes(config, 200, seed=1, mutations=10)
+    course = Course(5)
+    serial = batch_runner.evaluate(genomes, config, FlappyBird, course, schedule)
+
+    evaluator = ParallelEvaluator(2, batch_runner.simulate)
+    try:
+        parallel = batch_runner.evaluate(genomes, config, FlappyBird, course, schedule, evaluator=evaluator)
+    finally:
+        evaluator.close()
+    assert parallel == serial
+
+
+def test_course_is_determined_by_its_seed():
+    course = Course(7)
+    assert course.heights.tolist() == Course(7).heights.tolist()
+    assert course.heights.tolist() != Course(8).heights.tolist()
+    assert all(Course.MIN_HEIGHT <= height < Course.MAX_HEIGHT for height in course.heights.tolist())
+    # Generations share the course of the seed, unless every one gets its own
+    assert Course.for_generation(7, 3).heights.tolist() == course.heights.tolist()
+    fresh = [Course.for_generation(7, generation, True).heights.tolist() for generation in (1, 2, 1)]
+    assert fresh[0] == fresh[2] != fresh[1]
+
+
+def test_course_extends_without_changing_its_pipes():
+    course = Course(7, length=16)
+    start = course.heights.tolist()
+    height = course[40]
+    assert len(course) >= 41
+    assert course.heights[:16].tolist() == start
+    assert height == Course(7, length=41)[40]
+
+
+def test_fitness_cache_forgets_least_recently_used():
+    cache = FitnessCache(maxsize=2)
+    cache.put("a", 1.0)
+    cache.put("b", 2.0)
+    assert cache.get("a") == 1.0
+    # "b" is now the least recently used entry
+    cache.put("c", 3.0)
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1.0, 3.0)
+    assert (cache.hits, cache.misses) == (3, 1)
+    cache.reset_counts()
+    assert (cache.hits, cache.misses) == (0, 0)
+
+
+def test_genome_key_depends_on_genes_and_context():
+    config = load_config()
+    genome, other = make_genomes(config, 2, seed=5)
+    twin = config.genome_type(99)
+    twin.nodes, twin.connections = genome.nodes, genome.connections
+    # The genome id does not matter, the genes and the course do
+    assert genome_key(genome, 1, 20) == genome_key(twin, 1, 20)
+    assert genome_key(genome, 1, 20) != genome_key(genome, 2, 20)
+    assert genome_key(genome, 1, 20) != genome_key(other, 1, 20)
+
+
+class FitnessRecorder(neat.reporting.BaseReporter):
+    # The fitness of every genome of every generation, by genome key
+    def __init__(self):
+        self.generations = []
+
+    def post_evaluate(self, config, population, species, best_genome):
+        self.generations.append(dict((key, genome.fitness) for key, genome in population.items()))
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    # Runs write their logs and checkpoints to the working folder, the sprites are still read from this one
+    monkeypatch.setattr(assets, "ASSET_DIR", os.path.join(HERE, "assets"))
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.mark.parametrize("halving_stages", [1, 3], ids=["cache", "halving"])
+def test_resume_matches_uninterrupted_run(halving_stages, workdir):
+    options = dict(headless=True, max_score=8, halving_stages=halving_stages)
+
+    uninterrupted = FitnessRecorder()
+    winner = flappy_bird.RUNNER.run(CONFIG, 6, seed=11, checkpoint_every=3, reporters=[uninterrupted], **options)
+    assert len(uninterrupted.generations) == 6
+
+    resumed = FitnessRecorder()
+    resumed_winner = flappy_bird.RUNNER.run(CONFIG, 6, checkpoint_every=0, resume="checkpoint-3.bin",
+                                            reporters=[resumed], **options)
+    assert resumed.generations == uninterrupted.generations[3:]
+    assert (resumed_winner.key, resumed_winner.fitness) == (winner.key, winner.fitness)
+
+
+def test_stats_log_appends_and_cuts_back_on_resume(workdir):
+    log = StatsLog("log")
+    for generation in range(3):
+        log.append([generation, generation + 2.0], species=1)
+    log.close()
+    reader = StatsLogReader("log")
+    assert reader.read() == (3, True)
+    assert reader["best"].tolist() == [2.0, 3.0, 4.0]
+    assert reader["mean"].tolist() == [1.0, 2.0, 3.0]
+
+    # Only the rows added since the last read are new
+    log = StatsLog("log", keep=3)
+    log.append([10.0], species=2)
+    assert reader.read() == (1, False)
+    assert reader.read() == (0, False)
+    log.close()
+
+    # Resuming from an earlier generation drops the rows after it, readers start over
+    log = StatsLog("log", keep=2)
+    log.append([20.0], species=3)
+    log.close()
+    assert reader.read() == (3, True)
+    assert reader["best"].tolist() == [2.0, 3.0, 20.0]
+    assert reader["species"].tolist() == [1.0, 1.0, 3.0]
+
+
+def test_read_log_keeps_output_in_step_with_the_log(workdir, monkeypatch):
+    monkeypatch.setattr(graph_results, "LOG", StatsLogReader("log"))
+    monkeypatch.setattr(graph_results, "output_rows", 0)
+    monkeypatch.setattr(graph_results, "output_signature", None)
+    log = StatsLog("log")
+    log.append([1.4, 0.0], species=1)
+    log.append([2.6, 1.0], species=1)
+    best, average = graph_results.read_log()
+    assert best.tolist() == [1.4, 2.6]
+    log.append([4.0, 4.0], species=1)
+    graph_results.read_log()
+    log.close()
+    with open(graph_results.OUTPUT_FILE_PATH) as f:
+        assert f.read().split() == ["1,1", "3,2", "4,4"]
+
+
+def test_lttb_keeps_the_ends_and_the_number_of_points():
+    x = np.arange(1000, dtype=float)
+    y = np.sin(x / 30) + np.random.RandomState(0).normal(0, 0.1, len(x))
+    small_x, small_y = graph_results.lttb(x, y, 100)
+    assert len(small_x) == len(small_y) == 100
+    assert (small_x[0], small_x[-1]) == (x[0], x[-1])
+    assert (small_y[0], small_y[-1]) == (y[0], y[-1])
+    assert np.all(np.diff(small_x) > 0)
+    assert set(small_x.tolist()) <= set(x.tolist())
+    # Short enough already
+    # Histories that are short enough already are plotted as they are
+    short_x, short_y = graph_results.lttb(x[:50], y[:50], 100)
+    assert short_x.tolist() == x[:50].tolist() and short_y.tolist() == y[:50].tolist()
+
+
+
+def fields(recorded):
+    return (recorded.course_seed, recorded.genome_id, recorded.generation, recorded.frames, recorded.fitness,
+            recorded.jumps)
+
+
+def test_replay_survives_bytes_and_files(workdir):
+    # Negative course seeds (--seed -1) included
+    recorded = [replay.Replay(-3, 17, 4, 300, 31.5, [0, 5, 200, 299]), replay.Replay(2 ** 40, 0, 0, 1, -1.0, [])]
+    for one in recorded:
+        assert fields(replay.Replay.from_bytes(one.to_bytes())) == fields(one)
+
+    replay.save("runs.replay", recorded[:1])
+    replay.save("runs.replay", recorded[1:], append=True)
+    assert [fields(one) for one in replay.load("runs.replay")] == [fields(one) for one in recorded]
+
+    # Files from before seeds were zigzag encoded still load, but cannot be added to
+    body = bytearray()
+    for value in (7, 17, 4, 300, 2):
+        replay.write_varint(body, value)
+    body += np.array(31.5, dtype="<f8").tobytes()
+    for gap in (5, 195):
+        replay.write_varint(body, gap)
+    header = bytearray()
+    replay.write_varint(header, len(body))
+    with open("old.replay", "wb") as f:
+        f.write(replay.LEGACY_MAGIC + bytes(header) + bytes(body))
+    assert [fields(one) for one in replay.load("old.replay")] == [(7, 17, 4, 300, 31.5, [5, 200])]
+    with pytest.raises(ValueError):
+        replay.save("old.replay", recorded, append=True)
+
+
+class ReplayChecker(flappy_bird.ReplayRecorder):
+    # Every champion's replay, taken from its generation's episode, next to a flight of the champion on its own
+    def __init__(self):
+        flappy_bird.ReplayRecorder.__init__(self)
+        self.checked = []
+
+    def post_evaluate(self, config, population, species, best_genome):
+        flappy_bird.ReplayRecorder.post_evaluate(self, config, population, species, best_genome)
+        runner = flappy_bird.RUNNER
+        solo = flappy_bird.record_replay(best_genome, config, runner.scenario, runner.schedule.max_score,
+                                         self.last.generation)
+        episode = batch_runner.Episode(FlappyBird(runner.scenario), [best_genome], config)
+        episode.run(runner.schedule.max_score)
+        self.checked.append((self.last, solo, episode.env.score))
+
+
+@pytest.mark.parametrize("options", [dict(), dict(halving_stages=3)], ids=["cache", "halving"])
+def test_replays_fly_the_recorded_flight(options, workdir):
+    checker = ReplayChecker()
+    flappy_bird.RUNNER.run(CONFIG, 4, headless=True, seed=11, max_score=8, checkpoint_every=0, reporters=[checker],
+                           record=True, **options)
+    assert len(checker.checked) == 4
+    for recorded, solo, score in checker.checked:
+        assert fields(recorded) == fields(solo)
+        assert flappy_bird.play_replay(recorded, render=False) == score
+    assert max(score for recorded, solo, score in checker.checked) > 0
+
+
+def test_immigrants_replace_the_newest_offspring():
+    config = load_config()
+    p = neat.Population(config)
+    keys = sorted(p.population)
+    migrants = make_genomes(config, 2, seed=4)
+    for migrant in migrants:
+        migrant.fitness = 50.0
+
+    islands.immigrate(p, migrants)
+    assert len(p.population) == len(keys)
+    assert sorted(p.population)[:-2] == keys[:-2]
+    arrived = [p.population[key] for key in sorted(p.population)[-2:]]
+    assert min(genome.key for genome in arrived) > keys[-1]
+    for genome, migrant in zip(arrived, migrants):
+        assert genome.fitness is None
+        assert sorted(genome.connections) == sorted(migrant.connections)
+    # New nodes are numbered after every node the migrants brought along, and every genome has a species
+    highest = max(node for genome in p.population.values() for node in genome.nodes)
+    assert next(config.genome_config.node_indexer) > highest
+    assert sorted(p.species.genome_to_species) == sorted(p.population)
+
+
+def test_islands_stop_once_one_reaches_the_threshold(tmp_path, monkeypatch):
+    # Islands are processes of their own, which find the sprites through the working folder
+    os.symlink(os.path.join(HERE, "assets"), str(tmp_path / "assets"))
+    monkeypatch.chdir(tmp_path)
+    with open(CONFIG) as f:
+        text = f.read()
+    assert "fitness_threshold     = 100" in text
+    with open("config", "w") as f:
+        f.write(text.replace("fitness_threshold     = 100", "fitness_threshold     = 30"))
+
+    # Takes a few generations, with migrants exchanged after each of them
+    winner = islands.run_islands("config", 2, interval=1, migrants=1, generations=50,
+                                 options=dict(seed=3, max_score=8))
+    assert winner.fitness >= 30
+    log = StatsLogReader("fitness_log")
+    log.read()
+    assert 1 < len(log) < 50
+
+
+def test_sweep_expands_grids_and_draws():
+    grid = sweep.expand(dict(parameters={"pop_size": [10, 50], "conn_add_prob": 0.5, "weight_mutate_rate": [0.1, 0.8]}))
+    assert grid == [{"pop_size": 10, "conn_add_prob": 0.5, "weight_mutate_rate": 0.1},
+                    {"pop_size": 10, "conn_add_prob": 0.5, "weight_mutate_rate": 0.8},
+                    {"pop_size": 50, "conn_add_prob": 0.5, "weight_mutate_rate": 0.1},
+                    {"pop_size": 50, "conn_add_prob": 0.5, "weight_mutate_rate": 0.8}]
+    with pytest.raises(ValueError):
+        sweep.expand(dict(parameters={"pop_size": {"min": 10, "max": 50}}))
+    with pytest.raises(ValueError):
+        sweep.expand(dict(mode="bayesian", parameters={"pop_size": [10]}))
+
+    # Random draws only depend on the seed, so a resumed sweep draws the same trials again
+    spec = dict(mode="random", trials=20, seed=4, parameters={
+        "pop_size": {"min": 10, "max": 50}, "conn_add_prob": {"min": 0.01, "max": 1.0, "log": True},
+        "activation_default": ["tanh", "sigmoid"]})
+    drawn = sweep.expand(spec)
+    assert drawn == sweep.expand(spec) != sweep.expand(dict(spec, seed=5))
+    assert len(drawn) == 20
+    assert all(isinstance(values["pop_size"], int) and 10 <= values["pop_size"] <= 50 for values in drawn)
+    assert all(0.01 <= values["conn_add_prob"] <= 1.0 for values in drawn)
+    assert set(values["activation_default"] for values in drawn) == {"tanh", "sigmoid"}
+
+
+def test_sweep_resumes_with_the_trials_not_done(tmp_path, monkeypatch, capsys):
+    # Trials are trained by processes of their own, which find the sprites through the working folder
+    os.symlink(os.path.join(HERE, "assets"), str(tmp_path / "assets"))
+    monkeypatch.chdir(tmp_path)
+    spec = dict(mode="grid", seed=3, generations=1, parameters={"pop_size": [5, 6]})
+    rows, fields = sweep.sweep(spec, CONFIG, "out", workers=1)
+    assert sorted(row["pop_size"] for row in rows) == [5, 6]
+    assert "error" not in [row["status"] for row in rows]
+    assert "2 to run" in capsys.readouterr().out
+
+    # Nothing is left to do, unless a trial failed
+    rows, fields = sweep.sweep(spec, CONFIG, "out", workers=1)
+    assert len(rows) == 2
+    assert "0 to run" in capsys.readouterr().out
+    failed = rows[0]["trial"]
+    sweep.write_results(os.path.join("out", "results.csv"), [dict(row, status="error") if row["trial"] == failed
+                                                            else row for row in rows], fields)
+    rows, fields = sweep.sweep(spec, CONFIG, "out", workers=1)
+    assert "1 already done, 1 to run" in capsys.readouterr().out
+    table = sweep.read_results(os.path.join("out", "results.csv"))[0]
+    assert sorted(row["trial"] for row in table) == sorted(row["trial"] for row in rows)
+    assert "error" not in [row["status"] for row in table]
+
+
+def test_resume_from_checkpoints_with_the_old_key_names(workdir):
+    # Checkpoints saved before the runner was split from Flappy Bird named the scenario after its courses
+    options = dict(headless=True, seed=11, max_score=8)
+    flappy_bird.RUNNER.run(CONFIG, 3, checkpoint_every=2, **options)
+    state = checkpoint.load("checkpoint-2.bin")
+    extra = state["extra"]
+    state["extra"] = dict(gen=extra["generation"], seed=extra["seed"], fresh_course=extra["fresh"],
+                          course_seed=extra["scenario_seed"])
+    checkpoint.write("old.bin", pickle.dumps(state))
+
+    resumed = [FitnessRecorder(), FitnessRecorder()]
+    for path, recorder in zip(("checkpoint-2.bin", "old.bin"), resumed):
+        flappy_bird.RUNNER.run(CONFIG, 4, checkpoint_every=0, resume=path, reporters=[recorder], **options)
+    assert len(resumed[0].generations) == 2
+    assert resumed[1].generations == resumed[0].generations